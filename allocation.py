@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Parking Allocation Engine
+Pure allocation logic shared by app.py and auto_allocate.py.
+No file I/O and no Streamlit calls - callers load/save data themselves.
+"""
+
+import heapq
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime
+from itertools import count
+
+from capacity import resolve_zones
+from records import make_record
+
+
+def get_capacity(config, date, sante_opt_out=False, site_id=None):
+    """
+    Zones with the slots that apply on date (see capacity.py).
+    Sante not parking frees extra slots via the site's "sante_opt_out" flag.
+    """
+    return resolve_zones(config, date, {"sante_opt_out": sante_opt_out}, site_id)
+
+
+def _parse_timestamp(entry):
+    # Old request format stored applicants as plain name strings (no timestamp)
+    if isinstance(entry, dict) and entry.get("timestamp"):
+        return datetime.fromisoformat(entry["timestamp"]), entry["timestamp"]
+    return datetime.min, None
+
+
+def index_users(users):
+    # Name-keyed user index. Build once per load and keep in sync on add/edit/delete.
+    return {u["name"]: u for u in users}
+
+
+def rank_key(candidate):
+    """
+    Allocation priority (smaller first): guests by application time, then staff
+    by fairness score (see fairness.py), least recently parked, earliest applicant.
+    """
+    if candidate["type"] == "guest":
+        return (0, 0.0, "", candidate["timestamp"])
+    return (1, candidate["fairness"], candidate["last_parked"] or "0000-00-00", candidate["timestamp"])
+
+
+def build_candidates(requests, users, user_index=None, sort=True, fairness=None):
+    """
+    Build staff and guest candidate lists from requests data, sorted by rank_key
+    (sort=False leaves application order, e.g. for AllocationQueue).
+    fairness: name -> score (FairnessIndex.scores()); without it staff rank by last_parked.
+    Returns: (staff_candidates, guest_candidates)
+    """
+    user_by_name = user_index if user_index is not None else index_users(users)
+
+    staff_c = []
+    for app in requests.get("applicants", []):
+        u_name = app if isinstance(app, str) else app["name"]
+        ts, applied_at = _parse_timestamp(app)
+
+        user_obj = user_by_name.get(u_name)
+        if user_obj:
+            staff_c.append({
+                "type": "staff",
+                "name": u_name,
+                "car_type": user_obj["car_type"],
+                "last_parked": user_obj.get("last_parked_date"),
+                "fairness": fairness.get(u_name, 0.0) if fairness else 0.0,
+                "timestamp": ts,
+                "record": make_record(u_name, user_obj["car_type"], "staff", applied_at)
+            })
+
+    guest_c = []
+    for g in requests.get("guests", []):
+        ts, applied_at = _parse_timestamp(g)
+        guest_c.append({
+            "type": "guest",
+            "name": g["name"],
+            "car_type": g["car_type"],
+            "location": g["location"],
+            "timestamp": ts,
+            "record": make_record(g["name"], g["car_type"], "guest", applied_at)
+        })
+
+    if sort:
+        staff_c.sort(key=rank_key)
+        guest_c.sort(key=rank_key)
+
+    return staff_c, guest_c
+
+
+SOLVERS = ("greedy", "optimal")
+
+
+def _eligibility(capacity):
+    """
+    eligible(candidate) -> (key, zone ids in fill order).
+    Zones allow the car type; guests naming a zone in their location ("관리실(ADMIN)")
+    are limited to it, anything else ("상관없음(ANY)") may use every zone.
+    Resolved once per distinct (car_type, location) key.
+    """
+    cache = {}
+
+    def eligible(candidate):
+        key = (candidate["car_type"], candidate.get("location"))
+        if key not in cache:
+            location = key[1]
+            named = [z for z in capacity if location and z["name"] in location]
+            cache[key] = [z["id"] for z in (named or capacity) if key[0] in z["car_types"]]
+        return key, cache[key]
+
+    return eligible
+
+
+class AllocationQueue:
+    """
+    Greedy allocation kept as incremental state.
+    Candidates are pushed onto a heap keyed by rank_key and placed as they are
+    popped: each takes the first zone (in fill order) with a free slot that allows
+    its car type. Each zone keeps the sorted ranks of its occupants.
+
+    A late candidate can be pushed after the initial run. Greedy placement only
+    depends on who ranks higher, so only the tail behind it can change, and at most
+    one person per zone: whoever held the last slot of the zone it takes moves on to
+    their next free zone (or waits), possibly bumping the last one there, and so on.
+    Each hop is a bisect, so a late insertion costs O(zones^2 log n) instead of a
+    full re-sort and re-run.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._eligible = _eligibility(capacity)
+        self._slots = {z["id"]: z["slots"] for z in capacity}
+        self._ranks = {z["id"]: [] for z in capacity}  # zone -> sorted occupant ranks
+        self._waiting = []  # sorted ranks
+        self._open = sum(max(n, 0) for n in self._slots.values())  # free slots overall
+        self._top = None  # upper bound of placed ranks
+        self._candidates = {}  # rank -> candidate
+        self._heap = []
+        self._seq = count()  # tie-break: equal keys keep push order
+
+    def push(self, candidate):
+        heapq.heappush(self._heap, (rank_key(candidate), next(self._seq), candidate))
+
+    def run(self):
+        # Place everything pushed so far, in rank order
+        while self._heap:
+            key, seq, candidate = heapq.heappop(self._heap)
+            self._insert((key, seq), candidate)
+        return self
+
+    def _first_free(self, candidate, rank, after=None):
+        # First eligible zone (after the given one) with a free slot at this rank
+        zones = self._eligible(candidate)[1]
+        start = zones.index(after) + 1 if after is not None else 0
+        for zone_id in zones[start:]:
+            if bisect_left(self._ranks[zone_id], rank) < self._slots[zone_id]:
+                return zone_id
+        return None
+
+    def _insert(self, rank, candidate):
+        self._candidates[rank] = candidate
+        if self._open == 0 and (self._top is None or rank > self._top):
+            # Everything is full and this one ranks after every occupant: it waits
+            insort(self._waiting, rank)
+            return
+        zone_id = self._first_free(candidate, rank)
+        while zone_id is not None:
+            insort(self._ranks[zone_id], rank)
+            self._top = rank if self._top is None else max(self._top, rank)
+            if len(self._ranks[zone_id]) <= self._slots[zone_id]:
+                self._open -= 1
+                return
+            # Over capacity: the lowest-ranked occupant moves on
+            rank = self._ranks[zone_id].pop()
+            candidate = self._candidates[rank]
+            zone_id = self._first_free(candidate, rank, after=zone_id)
+        insort(self._waiting, rank)
+
+    def result(self, date):
+        """Returns: (history_entry, parked_staff_names) - same shape as allocate()."""
+        self.run()
+        entry = {"date": date}
+        placed = []
+        for zone_id, ranks in self._ranks.items():
+            entry[zone_id] = [self._candidates[r]["record"] for r in ranks]
+            placed.extend(ranks)
+        entry["wait"] = [self._candidates[r]["record"] for r in self._waiting]
+        parked = [self._candidates[r]["name"] for r in sorted(placed)
+                  if self._candidates[r]["type"] == "staff"]
+        return entry, parked
+
+
+def _assign_optimal(candidates, capacity, eligible):
+    """
+    Maximum-cardinality assignment that never bumps a higher-priority candidate.
+    Candidates are added in priority order; each one is placed along a shortest
+    augmenting path (BFS over zones, moving already-placed people to another zone
+    they fit) or waits if no path exists. Placed sets form a transversal matroid,
+    so this greedy yields the maximum count and the best priority order among them.
+
+    Occupants are grouped per zone by eligibility key, so one BFS costs
+    O(zones x keys) regardless of how many people are already placed.
+    """
+    free = {z["id"]: z["slots"] for z in capacity}
+    occupants = {z["id"]: {} for z in capacity}  # zone -> key -> [candidate index]
+    zones_of = {}  # key -> eligible zone ids
+    total_free = sum(free.values())
+
+    for i, c in enumerate(candidates):
+        if total_free == 0:
+            break  # everyone left waits
+        key, zones = eligible(c)
+        zones_of[key] = zones
+
+        # BFS: parent[zone] = (previous zone, key of the person moving in) or (None, None)
+        parent = {}
+        queue = deque()
+        for z in zones:
+            parent[z] = (None, None)
+            queue.append(z)
+        found = None
+        while queue:
+            z = queue.popleft()
+            if free[z] > 0:
+                found = z
+                break
+            for occ_key, members in occupants[z].items():
+                if not members:
+                    continue
+                for z2 in zones_of[occ_key]:
+                    if z2 not in parent:
+                        parent[z2] = (z, occ_key)
+                        queue.append(z2)
+        if found is None:
+            continue
+
+        # Augment: shift one person per hop back towards the new candidate
+        free[found] -= 1
+        total_free -= 1
+        z = found
+        while True:
+            prev, move_key = parent[z]
+            if prev is None:
+                occupants[z].setdefault(key, []).append(i)
+                break
+            occupants[z].setdefault(move_key, []).append(occupants[prev][move_key].pop())
+            z = prev
+
+    assignment = [None] * len(candidates)
+    for zone_id, groups in occupants.items():
+        for members in groups.values():
+            for i in members:
+                assignment[i] = zone_id
+    return assignment
+
+
+def allocate(requests: dict, users: list, capacity: list, date: str,
+             user_index: dict | None = None, solver: str = "greedy",
+             fairness: dict | None = None) -> tuple[dict, list[str]]:
+    """
+    Allocate parking for one date.
+    capacity is the ordered zone list from get_capacity.
+    Guests come first (by requested location), then staff by priority.
+
+    solver="greedy" (default): each candidate takes the first zone (in fill order)
+    that has a free slot and allows its car type (see AllocationQueue).
+    solver="optimal": parks as many people as possible without bumping anyone of
+    higher priority, e.g. moves a SEDAN out of the only SUV-capable zone.
+
+    Pass user_index (see index_users) to skip rebuilding it on every call, and
+    fairness (FairnessIndex.scores()) to rank staff by their whole history.
+    Slots are structured records (see records.py).
+
+    Returns: (history_entry, parked_staff_names) - history_entry has one list per zone id + "wait"
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver: {solver}")
+
+    if solver == "greedy":
+        staff_c, guest_c = build_candidates(requests, users, user_index, sort=False, fairness=fairness)
+        queue = AllocationQueue(capacity)
+        for c in guest_c + staff_c:
+            queue.push(c)
+        return queue.result(date)
+
+    staff_c, guest_c = build_candidates(requests, users, user_index, fairness=fairness)
+    candidates = guest_c + staff_c
+    assignment = _assign_optimal(candidates, capacity, _eligibility(capacity))
+
+    results = {z["id"]: [] for z in capacity}
+    result_wait = []
+    parked = []
+    for c, zone_id in zip(candidates, assignment):
+        if zone_id is None:
+            result_wait.append(c["record"])
+            continue
+        results[zone_id].append(c["record"])
+        if c["type"] == "staff":
+            parked.append(c["name"])
+
+    history_entry = {"date": date, **results, "wait": result_wait}
+    return history_entry, parked
+
+
+def mark_parked(users, names, date, user_index=None):
+    # Update last_parked_date for allocated staff (in place)
+    user_by_name = user_index if user_index is not None else index_users(users)
+    for name in names:
+        user = user_by_name.get(name)
+        if user:
+            user["last_parked_date"] = date
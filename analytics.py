@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+History Analytics
+Loads the allocation history once into a long-form DataFrame
+
+    date | zone | person | car_type | kind | source        (one row per slot record, zone "wait" = waitlisted)
+
+and answers the admin "통계" tab with vectorized groupbys:
+zone utilization per day, wait rates, per-person share and weekday patterns.
+
+The frame is cached per process, keyed on the archive version
+(PartitionedHistory.version), so reruns reuse it until history changes.
+"""
+
+import pandas as pd
+
+from capacity import get_site
+from records import slot_keys
+
+COLUMNS = ["date", "zone", "person", "car_type", "kind", "source"]
+WEEKDAY_NAMES = ["월", "화", "수", "목", "금", "토", "일"]
+
+# version -> DataFrame
+_frame_cache = {}
+
+
+def history_frame(entries):
+    rows = [
+        (h["date"], key, r["name"], r.get("car_type"), r.get("kind"), r.get("source"))
+        for h in entries
+        for key in slot_keys(h)
+        for r in h[key]
+    ]
+    df = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    df["date"] = pd.to_datetime(df["date"])
+    for col in ("zone", "car_type", "kind", "source"):
+        df[col] = df[col].astype("category")
+    return df
+
+
+def load_frame(history):
+    # Whole archive as a frame; rebuilt only when a month was saved since
+    version = history.version
+    df = _frame_cache.get(version)
+    if df is None:
+        df = history_frame(history.entries)
+        _frame_cache.clear()
+        _frame_cache[version] = df
+    return df
+
+
+def filter_period(df, start=None, end=None):
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["date"] <= pd.Timestamp(end)
+    return df[mask]
+
+
+def zone_utilization(df, capacity_config, site_id=None):
+    """
+    Occupied / capacity per zone per day (rows: date, columns: zone id).
+    Capacity is the configured slots with day overrides. Flags such as sante_opt_out
+    are not kept in history, so a day with more cars than base slots counts as full.
+    """
+    site = get_site(capacity_config, site_id)
+    zone_ids = [z["id"] for z in site["zones"]]
+    parked = df[df["zone"].isin(zone_ids)]
+    dates = pd.DatetimeIndex(df["date"].unique()).sort_values()
+
+    occupied = (parked.groupby(["date", "zone"], observed=True).size()
+                .unstack(fill_value=0)
+                .reindex(index=dates, columns=zone_ids, fill_value=0))
+
+    slots = pd.DataFrame({z["id"]: z["slots"] for z in site["zones"]}, index=dates)
+    for day, overrides in site.get("day_overrides", {}).items():
+        day = pd.Timestamp(day)
+        if day in slots.index:
+            for zone_id, n in overrides.items():
+                if zone_id in slots.columns:
+                    slots.loc[day, zone_id] = n
+
+    capacity = slots.where(slots >= occupied, occupied)
+    return (occupied / capacity.where(capacity > 0)).fillna(0.0)
+
+
+def daily_summary(df):
+    # Applicants, parked and waitlisted per day + wait rate
+    waited = df["zone"] == "wait"
+    daily = pd.DataFrame({
+        "applicants": df.groupby("date").size(),
+        "waits": waited.groupby(df["date"]).sum()
+    })
+    daily["parked"] = daily["applicants"] - daily["waits"]
+    daily["wait_rate"] = daily["waits"] / daily["applicants"]
+    return daily
+
+
+def person_share(df):
+    """Staff only: parks / waits / wait rate / share of all staff parks, most parks first."""
+    staff = df[df["kind"] == "staff"]
+    waited = staff["zone"] == "wait"
+    per_person = pd.DataFrame({
+        "parks": (~waited).groupby(staff["person"]).sum(),
+        "waits": waited.groupby(staff["person"]).sum()
+    })
+    per_person["wait_rate"] = per_person["waits"] / (per_person["parks"] + per_person["waits"])
+    total = per_person["parks"].sum()
+    per_person["share"] = per_person["parks"] / total if total else 0.0
+    return per_person.sort_values(["parks", "waits"], ascending=[False, True])
+
+
+def weekday_pattern(df):
+    # Average applicants / waits per allocation day, by weekday (월-일)
+    daily = daily_summary(df)
+    by_day = daily.groupby(daily.index.dayofweek).agg(
+        days=("applicants", "size"),
+        applicants=("applicants", "mean"),
+        waits=("waits", "mean"),
+        wait_rate=("wait_rate", "mean")
+    )
+    by_day.index = [WEEKDAY_NAMES[i] for i in by_day.index]
+    return by_day
@@ -1,22 +1,44 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
-import json
-import pandas as pd
 from datetime import datetime, timedelta
 import pytz # Required for timezone handling
-import os
 import textwrap
 
+from storage import configure, load_json, save_json
+from request_log import (REQUESTS_LOG_FILE, append_event, applicant_name, compact,
+                         load_requests, reset_requests)
+from allocation import get_capacity, index_users
+from capacity import get_site, load_capacity_config, resolve_zones
+from history_store import PartitionedHistory, month_of
+from fairness import FairnessIndex
+from stats import UserStats
+import analytics
+import parquet_export
+import excel_export
+from slack_message import render_allocation
+import slack_outbox
+from notifications import fan_out, make_resolver
+from scheduler import AllocationScheduler, run_allocation
+from run_ledger import content_hash, get_run, release as release_run
+from records import display_name, make_record, option_label, slot_keys
+
 # --- Constants ---
 # --- Constants ---
 USERS_FILE = "users.json"
 REQUESTS_FILE = "requests.json"
-HISTORY_FILE = "history.json"
 
-# TODO: Enter your Slack Webhook URL here
-SLACK_WEBHOOK_URL = "" 
+def get_secret(key, default=None):
+    # st.secrets raises when no secrets.toml exists (local runs)
+    try:
+        if hasattr(st, 'secrets') and key in st.secrets:
+            return st.secrets[key]
+    except Exception:
+        pass
+    return default
 
-import requests # Ensure requests is imported
+# Storage backend: "json" (default) or "sqlite" via STORAGE_BACKEND / SQLITE_PATH secrets
+# (PARKING_STORAGE / PARKING_DB environment variables also work, see storage.py)
+configure(get_secret("STORAGE_BACKEND"), get_secret("SQLITE_PATH"))
 
 # --- Custom CSS for Toss-Inspired Design ---
 def local_css():
@@ -243,19 +265,6 @@ def local_css():
     """, unsafe_allow_html=True)
 
 # --- Helper Functions ---
-def load_json(file_path, default_data):
-    if not os.path.exists(file_path):
-        return default_data
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        return default_data
-
-def save_json(file_path, data):
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
 def get_kst_time():
     return datetime.now(pytz.timezone('Asia/Seoul'))
 
@@ -279,32 +288,48 @@ def get_target_date():
     return target
 
 
-def send_slack_message(message):
+def slot_columns(capacity, entry=None):
     """
-    Send a message to Slack using webhook URL from secrets.
-    Returns: (success: bool, message: str)
+    Columns for a history entry: [(slot key, label, zone or None)] - the site's zones in
+    display order, zone ids only found in the entry (zones removed since), then "wait".
     """
-    try:
-        # Try to get webhook URL from Streamlit secrets
-        if hasattr(st, 'secrets') and 'SLACK_WEBHOOK_URL' in st.secrets:
-            webhook_url = st.secrets['SLACK_WEBHOOK_URL']
-        else:
-            return False, "Slack Webhook URL이 설정되지 않았습니다. Streamlit Cloud의 Secrets에 SLACK_WEBHOOK_URL을 추가해주세요."
-        
-        # Send POST request to Slack
-        import requests
-        payload = {"text": message}
-        response = requests.post(webhook_url, json=payload, timeout=10)
-        
-        if response.status_code == 200:
-            return True, "슬랙 메시지 전송 성공!"
-        else:
-            return False, f"슬랙 전송 실패 (상태 코드: {response.status_code})"
-    
-    except ImportError:
-        return False, "requests 라이브러리가 설치되지 않았습니다. requirements.txt에 'requests'를 추가해주세요."
-    except Exception as e:
-        return False, f"슬랙 전송 중 오류 발생: {str(e)}"
+    zones = sorted(capacity, key=lambda z: z["display"])
+    columns = [(z["id"], f"{z['icon']} {z['name']}", z) for z in zones]
+    known = {z["id"] for z in zones}
+    for key in slot_keys(entry) if entry else []:
+        if key not in known and key != "wait":
+            columns.append((key, key, None))
+    return columns + [("wait", "⏳ 대기", None)]
+
+
+def slack_target(channel):
+    """
+    Post target for an outbox channel, from secrets: SLACK_WEBHOOK_URL (default),
+    SLACK_WEBHOOKS table (per-channel webhooks, e.g. "site:plabhouse" / "digest"),
+    SLACK_BOT_TOKEN (direct messages).
+    Resolved at delivery time, so webhook URLs / tokens never end up in the outbox file.
+    """
+    resolve = make_resolver(get_secret("SLACK_WEBHOOK_URL"), dict(get_secret("SLACK_WEBHOOKS", {})),
+                            get_secret("SLACK_BOT_TOKEN"))
+    return resolve(channel)
+
+
+def send_slack_message(message, key=None, channel="default"):
+    """
+    Queue a message in the Slack outbox (delivered by the background worker).
+    Returns: (queued: bool, message: str)
+    """
+    if not slack_target(channel):
+        return False, "Slack Webhook URL이 설정되지 않았습니다. Streamlit Cloud의 Secrets에 SLACK_WEBHOOK_URL을 추가해주세요."
+    created, _ = slack_outbox.enqueue(message, key=key, channel=channel)
+    if created:
+        return True, "슬랙 전송 대기열에 추가되었습니다."
+    return False, "이미 전송 대기열에 있는 메시지입니다."
+
+
+def notify_allocation(entry, capacity, user_index, site):
+    # Site channel + direct notices + digest, rendered once and queued in one batch
+    return fan_out(entry, capacity, user_index, site, slack_target)
 
 
 # --- Initialization ---
@@ -317,252 +342,48 @@ if "show_guest_form" not in st.session_state:
 
 # Load Data
 users = load_json(USERS_FILE, [])
-history = load_json(HISTORY_FILE, [])
+user_index = index_users(users)  # name -> user, kept in sync on add/edit/delete
+capacity_config = load_capacity_config()  # sites / zones / slots, see capacity.py
+# History: month-partitioned archive (history/), only the current month is read eagerly
+history = PartitionedHistory(eager_months=[month_of(str(get_kst_time().date()))], user_index=user_index)
+# Fairness scores from the whole history, updated as history entries change
+fairness = FairnessIndex(history=history)
+history.subscribe(fairness)
+# Per-user counters (parks / waits / zones / months / recent days), same mechanism
+user_stats = UserStats(history=history)
+history.subscribe(user_stats)
 
 target_date = get_target_date()
 
-requests_data = load_json(REQUESTS_FILE, {
-    "target_date": str(target_date),
-    "applicants": [],
-    "guests": [],
-    "sante_opt_out": False
-})
+# Requests view = requests.json snapshot + append-only log (see request_log.py)
+requests_data = load_requests(REQUESTS_FILE, REQUESTS_LOG_FILE, target_date)
 
-# Migration: Handle old 'guest' dict format if exists
-if "guest" in requests_data:
-    if isinstance(requests_data["guest"], dict) and requests_data["guest"].get("needed"):
-        old = requests_data["guest"]
-        requests_data["guests"] = [{
-            "name": "기존 손님",
-            "car_type": old.get("car_type", "SEDAN"),
-            "location": old.get("location", "상관없음(ANY)"),
-            "reason": "데이터 마이그레이션",
-            "researcher": "시스템"
-        }]
-    del requests_data["guest"]
-    save_json(REQUESTS_FILE, requests_data)
+# --- AUTOMATION: Auto-Allocate at 08:01 ---
+# Runs in a background thread (one per server process, see scheduler.py);
+# pages only read its result from history.
+@st.cache_resource
+def start_scheduler():
+    scheduler = AllocationScheduler(notify=notify_allocation)
+    scheduler.start()
+    return scheduler
 
-# Ensure 'guests' key exists
-if "guests" not in requests_data:
-    requests_data["guests"] = []
+# Slack messages are posted by a background worker with retries (see slack_outbox.py)
+@st.cache_resource
+def start_outbox_worker():
+    worker = slack_outbox.OutboxWorker(resolve=slack_target)
+    worker.start()
+    return worker
 
-# --- AUTOMATION: Auto-Allocate at 08:01 ---
+auto_scheduler = start_scheduler()
+start_outbox_worker()
 now_kst = get_kst_time()
 today_str = str(now_kst.date())
 
-# Check if it's time to auto-allocate (e.g., between 08:01 and 08:05)
-# And check if allocation for today doesn't exist yet
-history_today_check = next((h for h in history if h["date"] == today_str), None)
-
-if 8 <= now_kst.hour < 9 and now_kst.minute >= 1 and not history_today_check:
-    # Perform Allocation Logic (Same as Admin Button)
-    st.toast("🤖 08:01 자동 배정을 시작합니다...")
-    
-    admin_slots = 1
-    tower_slots = 2
-    if requests_data["sante_opt_out"]: 
-        tower_slots += 1
-    
-    candidates = []
-    
-    # Staff
-    for app in requests_data["applicants"]:
-        if isinstance(app, str):
-            u_name = app
-            u_time = "00:00"
-            ts = datetime.min
-        else:
-            u_name = app["name"]
-            u_time = datetime.fromisoformat(app["timestamp"]).strftime("%H:%M")
-            ts = datetime.fromisoformat(app["timestamp"])
-        
-        user_obj = next((u for u in users if u["name"] == u_name), None)
-        if user_obj:
-            candidates.append({
-                "type": "staff",
-                "name": u_name,
-                "car_type": user_obj["car_type"],
-                "last_parked": user_obj["last_parked_date"],
-                "timestamp": ts,
-                "display_name": f"{u_name} ({user_obj['car_type']}) {u_time}"
-            })
-    
-    # Guests
-    for g in requests_data["guests"]:
-        if "timestamp" in g:
-            ts = datetime.fromisoformat(g["timestamp"])
-            time_str = ts.strftime("%H:%M")
-        else:
-            ts = datetime.min
-            time_str = "00:00"
-        
-        g_label = f"{g['name']} ({g['car_type']}) {time_str}"
-        
-        candidates.append({
-            "type": "guest",
-            "name": g["name"],
-            "car_type": g["car_type"],
-            "location": g["location"],
-            "timestamp": ts,
-            "display_name": g_label
-        })
-    
-    # Sort
-    staff_c = [c for c in candidates if c["type"] == "staff"]
-    guest_c = [c for c in candidates if c["type"] == "guest"]
-    
-    staff_c.sort(key=lambda x: (x["last_parked"] if x["last_parked"] else "0000-00-00", x["timestamp"]))
-    guest_c.sort(key=lambda x: x["timestamp"])
-    
-    # Allocation
-    result_admin = []
-    result_tower = []
-    result_wait = []
-    
-    # Guests first
-    for g in guest_c:
-        assigned = False
-        if "관리실" in g["location"]:
-            if admin_slots > 0:
-                result_admin.append(g["display_name"])
-                admin_slots -= 1
-                assigned = True
-        elif "타워" in g["location"]:
-            if tower_slots > 0:
-                result_tower.append(g["display_name"])
-                tower_slots -= 1
-                assigned = True
-        elif "상관없음" in g["location"]:
-            if tower_slots > 0:
-                result_tower.append(g["display_name"])
-                tower_slots -= 1
-                assigned = True
-            elif admin_slots > 0:
-                result_admin.append(g["display_name"])
-                admin_slots -= 1
-                assigned = True
-        
-        if not assigned:
-            result_wait.append(g["display_name"])
-    
-    # Staff
-    for s in staff_c:
-        assigned = False
-        if s["car_type"] == "SUV":
-            if admin_slots > 0:
-                result_admin.append(s["display_name"])
-                admin_slots -= 1
-                assigned = True
-        else:
-            if tower_slots > 0:
-                result_tower.append(s["display_name"])
-                tower_slots -= 1
-                assigned = True
-            elif admin_slots > 0:
-                result_admin.append(s["display_name"])
-                admin_slots -= 1
-                assigned = True
-        
-        if not assigned:
-            result_wait.append(s["display_name"])
-    
-    # Update last_parked for assigned staff
-    for s in staff_c:
-        if s["display_name"] in result_admin or s["display_name"] in result_tower:
-            for u in users:
-                if u["name"] == s["name"]:
-                    u["last_parked_date"] = today_str
-                    break
-    
-    save_json(USERS_FILE, users)
-    
-    # Save to history
-    history.append({
-        "date": today_str,
-        "admin": result_admin,
-        "tower": result_tower,
-        "wait": result_wait
-    })
-    save_json(HISTORY_FILE, history)
-    
-    # Generate Slack Message
-    day_names = ["월", "화", "수", "목", "금", "토", "일"]
-    target_date_obj = datetime.strptime(today_str, "%Y-%m-%d").date()
-    target_weekday = day_names[target_date_obj.weekday()]
-    
-    admin_capacity = 1
-    tower_capacity = 3 if requests_data["sante_opt_out"] else 2
-    
-    admin_occupied = len(result_admin)
-    tower_occupied = len(result_tower)
-    
-    admin_remaining = admin_capacity - admin_occupied
-    tower_remaining = tower_capacity - tower_occupied
-    total_capacity = admin_capacity + tower_capacity
-    total_occupied = admin_occupied + tower_occupied
-    total_remaining = total_capacity - total_occupied
-    
-    def strip_time(name_str):
-        parts = name_str.rsplit(' ', 1)
-        if len(parts) == 2:
-            last_part = parts[1]
-            if ':' in last_part or last_part == '수동입력':
-                return parts[0]
-        return name_str
-
-    slack_msg = f"""📅 **{today_str} ({target_weekday}) 주차 배정 결과**
-
-🅿️ **주차 공간 현황**
-• 전체: {total_occupied}/{total_capacity} (남은 공간: {total_remaining})
-• 관리실: {admin_occupied}/{admin_capacity} (남은 공간: {admin_remaining})
-• 타워: {tower_occupied}/{tower_capacity} (남은 공간: {tower_remaining})
-
-🏢 **관리실 배정**"""
-    
-    if result_admin:
-        for name in result_admin:
-            slack_msg += f"\n• {strip_time(name)}"
-    else:
-        slack_msg += "\n• (배정 없음)"
-    
-    slack_msg += "\n\n🅿️ **타워 배정**"
-    if result_tower:
-        for name in result_tower:
-            slack_msg += f"\n• {strip_time(name)}"
-    else:
-        slack_msg += "\n• (배정 없음)"
-    
-    if result_wait:
-        slack_msg += "\n\n⏳ **대기 인원** (우선순위에서 밀림)"
-        for name in result_wait:
-            slack_msg += f"\n• {strip_time(name)}"
-            
-    # Send to Slack
-    success, msg = send_slack_message(slack_msg)
-    if success:
-        st.toast(f"✅ 자동 배정 및 슬랙 전송 완료!")
-    else:
-        st.toast(f"⚠️ 자동 배정 완료, 슬랙 전송 실패: {msg}")
-        
-    st.rerun()
-
 # Date Check
 # Date Check
 if requests_data["target_date"] != str(target_date):
-    # BACKUP LOGIC: Save previous data before reset
-    old_date = requests_data["target_date"]
-    if requests_data["applicants"] or requests_data["guests"]:
-        backup_file = f"requests_backup_{old_date}.json"
-        save_json(backup_file, requests_data)
-        # Optional: We could also log this action
-        
-    requests_data = {
-        "target_date": str(target_date),
-        "applicants": [],
-        "guests": [],
-        "sante_opt_out": False
-    }
-    save_json(REQUESTS_FILE, requests_data)
+    # Rollover: fold the log into a fresh snapshot (previous day goes to requests_backup_{date}.json)
+    requests_data = compact(REQUESTS_FILE, REQUESTS_LOG_FILE, target_date)
 
 local_css()
 
@@ -591,57 +412,30 @@ if st.session_state.page == "main":
     # TODAY'S ALLOCATION RESULTS (if available)
     # ============================================
     today_str = str(now_kst.date())
-    history_today = next((h for h in history if h["date"] == today_str), None)
+    history_today = history.get(today_str)
     
     if history_today:
         st.markdown("### 📅 오늘의 주차 배정 결과")
         
-        # Helper function to strip time info
-        def strip_time_display(name_str):
-            parts = name_str.rsplit(' ', 1)
-            if len(parts) == 2:
-                last_part = parts[1]
-                if ':' in last_part or last_part == '수동입력':
-                    return parts[0]
-            return name_str
-        
         # Calculate capacities
-        admin_capacity = 1
-        tower_capacity = 3 if requests_data["sante_opt_out"] else 2
-        admin_occupied = len(history_today["admin"])
-        tower_occupied = len(history_today["tower"])
-        admin_remaining = admin_capacity - admin_occupied
-        tower_remaining = tower_capacity - tower_occupied
-        
-        # Display results in columns
-        result_col1, result_col2, result_col3 = st.columns(3)
-        
-        with result_col1:
-            st.markdown(f"**🏢 관리실** ({admin_occupied}/{admin_capacity})")
-            if history_today["admin"]:
-                for name in history_today["admin"]:
-                    st.write(f"• {strip_time_display(name)}")
-            else:
-                st.caption("배정 없음")
-        
-        with result_col2:
-            st.markdown(f"**🅿️ 타워** ({tower_occupied}/{tower_capacity})")
-            if history_today["tower"]:
-                for name in history_today["tower"]:
-                    st.write(f"• {strip_time_display(name)}")
-            else:
-                st.caption("배정 없음")
-        
-        with result_col3:
-            st.markdown(f"**⏳ 대기** ({len(history_today['wait'])})")
-            if history_today["wait"]:
-                for name in history_today["wait"]:
-                    st.write(f"• {strip_time_display(name)}")
-            else:
-                st.caption("대기 없음")
+        capacity = get_capacity(capacity_config, today_str, requests_data["sante_opt_out"])
+        columns = slot_columns(capacity, history_today)
+        has_remaining = any(z["slots"] > len(history_today.get(z["id"], [])) for z in capacity)
+        
+        # Display results in columns: one per zone, then the waitlist
+        for col, (key, label, zone) in zip(st.columns(len(columns)), columns):
+            with col:
+                records = history_today.get(key, [])
+                count = f"{len(records)}/{zone['slots']}" if zone else len(records)
+                st.markdown(f"**{label}** ({count})")
+                if records:
+                    for name in records:
+                        st.write(f"• {display_name(name, with_time=False)}")
+                else:
+                    st.caption("대기 없음" if key == "wait" else "배정 없음")
         
         # Quick Access Button - Fill Remaining Slots
-        if admin_remaining > 0 or tower_remaining > 0:
+        if has_remaining:
             col_spacer, col_button = st.columns([3, 1])
             with col_button:
                 if st.button("🚗 남은 자리 주차하기", type="primary", use_container_width=True):
@@ -858,13 +652,19 @@ if st.session_state.page == "main":
     with card_col3:
         current_sante = requests_data["sante_opt_out"]
         sante_title = "상떼 주차 함" if not current_sante else "상떼 주차 안 함"
-        sante_desc = "타워 2대 사용 가능" if not current_sante else "타워 3대 사용 가능"
+        # Zones whose slots depend on the flag, e.g. "타워 2대 사용 가능"
+        sante_zones = get_site(capacity_config).get("flags", {}).get("sante_opt_out", {})
+        sante_capacity = get_capacity(capacity_config, requests_data["target_date"], current_sante)
+        sante_desc = " · ".join(f"{z['name']} {z['slots']}대" for z in sante_capacity if z["id"] in sante_zones) + " 사용 가능"
         
         btn_text = f"{sante_title}\n\n{sante_desc}"
         
         if st.button(btn_text, key="card_sante", use_container_width=True, type="secondary"):
-            requests_data["sante_opt_out"] = not current_sante
-            save_json(REQUESTS_FILE, requests_data)
+            append_event(REQUESTS_LOG_FILE, {
+                "op": "sante",
+                "target_date": str(target_date),
+                "value": not current_sante
+            })
             st.rerun()
     
     # Forms appear right after the cards (before status)
@@ -889,14 +689,17 @@ if st.session_state.page == "main":
                             st.error("이름을 선택해주세요.")
                         else:
                             name = user_map[selected_option]
-                            if any(a["name"] == name for a in requests_data["applicants"]):
+                            # Re-read the view so applications from other sessions are seen
+                            requests_data = load_requests(REQUESTS_FILE, REQUESTS_LOG_FILE, target_date)
+                            if any(applicant_name(a) == name for a in requests_data["applicants"]):
                                 st.error("이미 신청되었습니다.")
                             else:
-                                requests_data["applicants"].append({
+                                append_event(REQUESTS_LOG_FILE, {
+                                    "op": "apply",
+                                    "target_date": str(target_date),
                                     "name": name,
                                     "timestamp": datetime.now().isoformat()
                                 })
-                                save_json(REQUESTS_FILE, requests_data)
                                 st.success(f"✅ {name}님의 주차 신청이 완료되었습니다!")
                                 st.session_state.show_staff_form = False
                                 st.rerun()
@@ -913,11 +716,14 @@ if st.session_state.page == "main":
             
             g_car = st.radio("차종", ["SEDAN", "SUV"], horizontal=True, key="guest_car_type")
             
-            if g_car == "SUV":
-                st.caption("ℹ️ SUV는 타워 주차가 불가능합니다.")
-                valid_locs = ["관리실(ADMIN)"]
-            else:
-                valid_locs = ["관리실(ADMIN)", "타워(TOWER)", "상관없음(ANY)"]
+            # Locations are "관리실(ADMIN)" style zone labels (allocation matches the name)
+            guest_zones = sorted(resolve_zones(capacity_config), key=lambda z: z["display"])
+            excluded = [z["name"] for z in guest_zones if g_car not in z["car_types"]]
+            valid_locs = [f"{z['name']}({z['id'].upper()})" for z in guest_zones if g_car in z["car_types"]]
+            if excluded:
+                st.caption(f"ℹ️ {g_car}는 {', '.join(excluded)} 주차가 불가능합니다.")
+            if len(valid_locs) > 1:
+                valid_locs.append("상관없음(ANY)")
             
             g_loc = st.radio("주차 희망 위치", valid_locs, horizontal=True)
             
@@ -941,8 +747,11 @@ if st.session_state.page == "main":
                             "researcher": g_researcher,
                             "timestamp": datetime.now().isoformat()
                         }
-                        requests_data["guests"].append(new_guest)
-                        save_json(REQUESTS_FILE, requests_data)
+                        append_event(REQUESTS_LOG_FILE, {
+                            "op": "guest",
+                            "target_date": str(target_date),
+                            "guest": new_guest
+                        })
                         st.success(f"✅ {g_name}님의 외부인 주차가 등록되었습니다!")
                         st.session_state.show_guest_form = False
                         st.rerun()
@@ -997,7 +806,7 @@ else:
     st.divider()
     
     # Determine which tab to select based on session state
-    tab_names = ["📊 배정 결과", "👥 직원 관리", "📜 히스토리", "🗑️ 데이터 관리"]
+    tab_names = ["📊 배정 결과", "👥 직원 관리", "📜 히스토리", "📈 통계", "🗑️ 데이터 관리"]
     default_tab = 0  # Default to first tab
     
     # Check if admin_tab is set in session state
@@ -1008,7 +817,7 @@ else:
         del st.session_state.admin_tab
     
     # Tabs for Admin Functions
-    tab1, tab2, tab3, tab4 = st.tabs(tab_names)
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(tab_names)
     
     # ============================================
     # TAB 1: Allocation Results
@@ -1017,112 +826,40 @@ else:
         st.markdown("### 배정 결과")
         
         today_str = str(get_kst_time().date())
-        history_today = next((h for h in history if h["date"] == today_str), None)
+        history_today = history.get(today_str)
         
         if history_today:
             st.success(f"✅ {today_str} 배정 결과가 확정되었습니다.")
             
             # Calculate capacities
-            admin_capacity = 1
-            tower_capacity = 3 if requests_data["sante_opt_out"] else 2
-            
-            # Helper function to enrich name with car type
-            def enrich_name(name_str):
-                if "(" in name_str and ")" in name_str:
-                    return name_str
-                
-                parts = name_str.split()
-                base_name = parts[0] if parts else name_str
-                
-                user = next((u for u in users if u["name"] == base_name), None)
-                if user:
-                    car_type = user["car_type"]
-                    if len(parts) > 1 and ":" in parts[-1]:
-                        time_part = parts[-1]
-                        return f"{base_name} ({car_type}) {time_part}"
-                    else:
-                        return f"{base_name} ({car_type}) 수동입력"
-                
-                if len(parts) > 1 and ":" in parts[-1]:
-                    return name_str
-                else:
-                    return f"{name_str} 수동입력"
-            
-            admin_list = [enrich_name(item) for item in history_today["admin"]]
-            tower_list = [enrich_name(item) for item in history_today["tower"]]
-            wait_list = [enrich_name(item) for item in history_today["wait"]]
+            capacity = get_capacity(capacity_config, today_str, requests_data["sante_opt_out"])
+            columns = slot_columns(capacity, history_today)
             
-            admin_occupied = len(admin_list)
-            tower_occupied = len(tower_list)
-            
-            c1, c2, c3 = st.columns(3)
-            with c1:
-                st.markdown(f"#### 🏢 관리실 ({admin_occupied}/{admin_capacity})")
-                for item in admin_list:
-                    st.success(f"**{item}**", icon="✅")
-            with c2:
-                st.markdown(f"#### 🅿️ 타워 ({tower_occupied}/{tower_capacity})")
-                for item in tower_list:
-                    st.info(f"**{item}**", icon="🅿️")
-            with c3:
-                wait_count = len(wait_list)
-                st.markdown(f"#### ⏳ 대기 ({wait_count})")
-                for item in wait_list:
-                    st.warning(f"**{item}**", icon="⏳")
+            for col, (key, label, zone) in zip(st.columns(len(columns)), columns):
+                with col:
+                    # Records -> "Name (CAR) HH:MM" / "Name (CAR) 수동입력"
+                    items = [display_name(r, user_index=user_index) for r in history_today.get(key, [])]
+                    count = f"{len(items)}/{zone['slots']}" if zone else len(items)
+                    st.markdown(f"#### {label} ({count})")
+                    for item in items:
+                        if key == "wait":
+                            st.warning(f"**{item}**", icon="⏳")
+                        else:
+                            st.info(f"**{item}**", icon=zone["icon"] if zone else "✅")
             
             st.divider()
             
             # Slack Message
-            day_names = ["월", "화", "수", "목", "금", "토", "일"]
-            target_date_obj = datetime.strptime(today_str, "%Y-%m-%d").date()
-            target_weekday = day_names[target_date_obj.weekday()]
-            
-            admin_remaining = admin_capacity - admin_occupied
-            tower_remaining = tower_capacity - tower_occupied
-            total_capacity = admin_capacity + tower_capacity
-            total_occupied = admin_occupied + tower_occupied
-            total_remaining = total_capacity - total_occupied
-            
-            def strip_time(name_str):
-                parts = name_str.rsplit(' ', 1)
-                if len(parts) == 2:
-                    last_part = parts[1]
-                    if ':' in last_part or last_part == '수동입력':
-                        return parts[0]
-                return name_str
-            
-            slack_msg = f"""📅 **{today_str} ({target_weekday}) 주차 배정 결과**
-
-🅿️ **주차 공간 현황**
-• 전체: {total_occupied}/{total_capacity} (남은 공간: {total_remaining})
-• 관리실: {admin_occupied}/{admin_capacity} (남은 공간: {admin_remaining})
-• 타워: {tower_occupied}/{tower_capacity} (남은 공간: {tower_remaining})
-
-🏢 **관리실 배정**"""
-            
-            if admin_list:
-                for name in admin_list:
-                    slack_msg += f"\n• {strip_time(name)}"
-            else:
-                slack_msg += "\n• (배정 없음)"
-            
-            slack_msg += "\n\n🅿️ **타워 배정**"
-            if tower_list:
-                for name in tower_list:
-                    slack_msg += f"\n• {strip_time(name)}"
-            else:
-                slack_msg += "\n• (배정 없음)"
-            
-            if wait_list:
-                slack_msg += "\n\n⏳ **대기 인원** (우선순위에서 밀림)"
-                for name in wait_list:
-                    slack_msg += f"\n• {strip_time(name)}"
+            slack_msg = render_allocation(history_today, capacity, user_index)
             
             st.markdown("#### 📤 슬랙 메시지 (복사용)")
             st.code(slack_msg, language="markdown")
             
             if st.button("📢 슬랙으로 결과 전송", type="primary", use_container_width=True):
-                success, msg = send_slack_message(slack_msg)
+                # Same text twice is one message; an edited result gets a new key
+                site_id = get_site(capacity_config)["id"]
+                success, msg = send_slack_message(slack_msg, key=f"manual:{today_str}:{content_hash(slack_msg)}",
+                                                  channel=f"site:{site_id}")
                 if success:
                     st.success(f"✅ {msg}")
                 else:
@@ -1132,136 +869,45 @@ else:
             st.info(f"오늘({today_str}) 배정 결과는 08:00에 공개됩니다.")
         else:
             if st.button("배정 계산 실행", type="primary"):
-                # Allocation Logic
-                admin_slots = 1
-                tower_slots = 2
-                if requests_data["sante_opt_out"]: 
-                    tower_slots += 1
-                
-                candidates = []
-                
-                # Staff
-                for app in requests_data["applicants"]:
-                    if isinstance(app, str):
-                        u_name = app
-                        u_time = "00:00"
-                        ts = datetime.min
-                    else:
-                        u_name = app["name"]
-                        u_time = datetime.fromisoformat(app["timestamp"]).strftime("%H:%M")
-                        ts = datetime.fromisoformat(app["timestamp"])
-                    
-                    user_obj = next((u for u in users if u["name"] == u_name), None)
-                    if user_obj:
-                        candidates.append({
-                            "type": "staff",
-                            "name": u_name,
-                            "car_type": user_obj["car_type"],
-                            "last_parked": user_obj["last_parked_date"],
-                            "timestamp": ts,
-                            "display_name": f"{u_name} ({user_obj['car_type']}) {u_time}"
-                        })
-                
-                # Guests
-                for g in requests_data["guests"]:
-                    if "timestamp" in g:
-                        ts = datetime.fromisoformat(g["timestamp"])
-                        time_str = ts.strftime("%H:%M")
-                    else:
-                        ts = datetime.min
-                        time_str = "00:00"
-                    
-                    g_label = f"{g['name']} ({g['car_type']}) {time_str}"
-                    
-                    candidates.append({
-                        "type": "guest",
-                        "name": g["name"],
-                        "car_type": g["car_type"],
-                        "location": g["location"],
-                        "timestamp": ts,
-                        "display_name": g_label
-                    })
-                
-                # Sort
-                staff_c = [c for c in candidates if c["type"] == "staff"]
-                guest_c = [c for c in candidates if c["type"] == "guest"]
-                
-                staff_c.sort(key=lambda x: (x["last_parked"] if x["last_parked"] else "0000-00-00", x["timestamp"]))
-                guest_c.sort(key=lambda x: x["timestamp"])
-                
-                # Allocation
-                result_admin = []
-                result_tower = []
-                result_wait = []
-                
-                # Guests first
-                for g in guest_c:
-                    assigned = False
-                    if "관리실" in g["location"]:
-                        if admin_slots > 0:
-                            result_admin.append(g["display_name"])
-                            admin_slots -= 1
-                            assigned = True
-                    elif "타워" in g["location"]:
-                        if tower_slots > 0:
-                            result_tower.append(g["display_name"])
-                            tower_slots -= 1
-                            assigned = True
-                    elif "상관없음" in g["location"]:
-                        if tower_slots > 0:
-                            result_tower.append(g["display_name"])
-                            tower_slots -= 1
-                            assigned = True
-                        elif admin_slots > 0:
-                            result_admin.append(g["display_name"])
-                            admin_slots -= 1
-                            assigned = True
-                    
-                    if not assigned:
-                        result_wait.append(g["display_name"])
-                
-                # Staff
-                for s in staff_c:
-                    assigned = False
-                    if s["car_type"] == "SUV":
-                        if admin_slots > 0:
-                            result_admin.append(s["display_name"])
-                            admin_slots -= 1
-                            assigned = True
-                    else:
-                        if tower_slots > 0:
-                            result_tower.append(s["display_name"])
-                            tower_slots -= 1
-                            assigned = True
-                        elif admin_slots > 0:
-                            result_admin.append(s["display_name"])
-                            admin_slots -= 1
-                            assigned = True
-                    
-                    if not assigned:
-                        result_wait.append(s["display_name"])
-                
-                # Update last_parked for assigned staff
-                for s in staff_c:
-                    if s["display_name"] in result_admin or s["display_name"] in result_tower:
-                        for u in users:
-                            if u["name"] == s["name"]:
-                                u["last_parked_date"] = today_str
-                                break
-                
-                save_json(USERS_FILE, users)
-                
-                # Save to history
-                history.append({
-                    "date": today_str,
-                    "admin": result_admin,
-                    "tower": result_tower,
-                    "wait": result_wait
-                })
-                save_json(HISTORY_FILE, history)
-                
-                st.success("✅ 배정이 완료되었습니다!")
-                st.rerun()
+                # Same ledger-claimed job as the 08:01 scheduler, so the two never both allocate today
+                status, _, msg = run_allocation(today_str)
+                if status == "empty":
+                    st.warning(f"오늘({today_str}) 신청 내역이 없습니다.")
+                else:
+                    st.success("✅ 배정이 완료되었습니다!")
+                    st.rerun()
+
+        if auto_scheduler.last_run:
+            run = auto_scheduler.last_run
+            st.caption(f"🤖 자동 배정 ({run['date']}, {run['at'][11:16]}): {run['status']} - {run['message']}")
+        ledger_run = get_run(get_site(capacity_config)["id"], today_str)
+        if ledger_run:
+            st.caption(f"🧾 실행 기록: {ledger_run['status']} · run {ledger_run['run_id'][:8]} · "
+                       f"입력 {ledger_run['input_hash']} · 결과 {ledger_run['output_hash'] or '-'} · "
+                       f"시도 {ledger_run['attempts']}회" +
+                       (f" · 알림 {ledger_run['notify']}" if ledger_run.get("notify") else ""))
+
+        # Slack delivery status (outbox)
+        outbox = slack_outbox.messages()
+        if outbox:
+            st.divider()
+            col_title, col_retry = st.columns([8, 2])
+            with col_title:
+                st.markdown("#### 📬 슬랙 전송 현황")
+            with col_retry:
+                if any(m["status"] == "failed" for m in outbox):
+                    if st.button("🔁 재시도", use_container_width=True):
+                        st.toast(f"🔁 {slack_outbox.retry_failed()}건을 다시 전송합니다.")
+                        st.rerun()
+            status_labels = {"pending": "⏳ 대기", "sending": "📤 전송 중", "sent": "✅ 완료", "failed": "❌ 실패"}
+            st.dataframe([{
+                "생성": m["created_at"].replace("T", " "),
+                "키": m["key"],
+                "상태": status_labels.get(m["status"], m["status"]),
+                "시도": m["attempts"],
+                "다음 시도": m["next_attempt_at"].replace("T", " ") if m["status"] == "pending" else "",
+                "오류": m["last_error"]
+            } for m in reversed(outbox[-20:])], use_container_width=True, hide_index=True)
     
     # ============================================
     # TAB 2: Staff Management
@@ -1273,31 +919,16 @@ else:
             st.markdown("### 직원 관리")
         with col_excel:
             if st.button("📥 엑셀", use_container_width=True):
-                # Create DataFrame for export
-                export_data = []
-                for u in users:
-                    export_data.append({
-                        "이름": u["name"],
-                        "차종": u["car_type"],
-                        "차 번호": u.get("car_number", ""),
-                        "상세 차종": u.get("car_details", ""),
-                        "마지막 주차일": u.get("last_parked_date", "")
-                    })
-                df = pd.DataFrame(export_data)
-                
-                # Save to Excel
-                excel_file = "staff_list.xlsx"
-                df.to_excel(excel_file, index=False)
-                
-                # Read file for download
-                with open(excel_file, "rb") as f:
-                    file_data = f.read()
+                # Staff + history sheets, streamed into memory and cached until the data changes
+                file_data = excel_export.staff_workbook(
+                    users, user_stats, history, get_site(capacity_config)["zones"], month_of(str(now_kst.date()))
+                )
                 
                 st.download_button(
                     label="다운로드",
                     data=file_data,
                     file_name="staff_list.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    mime=excel_export.MIME_TYPE,
                     key="download_excel_btn"
                 )
         
@@ -1311,21 +942,25 @@ else:
                 col3, col4 = st.columns(2)
                 new_car_num = col3.text_input("차 번호 (선택)")
                 new_car_detail = col4.text_input("상세 차종 (선택)")
+                new_slack_id = st.text_input("슬랙 멤버 ID (선택, 개별 배정 알림)")
                 
                 if st.form_submit_button("추가", type="primary"):
                     if not new_name:
                         st.error("이름을 입력해주세요.")
-                    elif any(u["name"] == new_name for u in users):
+                    elif new_name in user_index:
                         st.error("이미 등록된 이름입니다.")
                     else:
-                        users.append({
+                        new_user = {
                             "name": new_name,
                             "car_type": new_car,
                             "car_number": new_car_num,
                             "car_details": new_car_detail,
+                            "slack_id": new_slack_id.strip(),
                             "last_parked_date": None
-                        })
-                        save_json(USERS_FILE, users)
+                        }
+                        users.append(new_user)
+                        user_index[new_name] = new_user
+                        save_json(USERS_FILE, users, backup=True)
                         st.success(f"✅ {new_name}님이 추가되었습니다!")
                         st.rerun()
         
@@ -1349,6 +984,8 @@ else:
             <hr style='margin: 0 0 5px 0; border: 0; border-top: 2px solid #e8e8ed;'>
             """, unsafe_allow_html=True)
             
+            this_month = month_of(str(now_kst.date()))
+            
             for idx, u in enumerate(users):
                 # Check if editing
                 if st.session_state.get(f"editing_user_{idx}", False):
@@ -1362,59 +999,39 @@ else:
                         edit_car = c2.selectbox("차종", ["SEDAN", "SUV"], index=0 if u["car_type"]=="SEDAN" else 1)
                         edit_num = c3.text_input("차 번호", value=u.get("car_number", ""))
                         edit_detail = c4.text_input("상세 차종", value=u.get("car_details", ""))
+                        edit_slack_id = st.text_input("슬랙 멤버 ID", value=u.get("slack_id", ""))
                         
                         save_col, cancel_col = st.columns([1, 1])
                         if save_col.form_submit_button("💾 저장", type="primary"):
                             # Check duplicate name if changed
-                            if edit_name != u["name"] and any(user["name"] == edit_name for user in users):
+                            if edit_name != u["name"] and edit_name in user_index:
                                 st.error("이미 존재하는 이름입니다.")
                             else:
+                                user_index.pop(old_name, None)
                                 u["name"] = edit_name
+                                user_index[edit_name] = u
                                 u["car_type"] = edit_car
                                 u["car_number"] = edit_num
                                 u["car_details"] = edit_detail
-                                save_json(USERS_FILE, users)
+                                u["slack_id"] = edit_slack_id.strip()
+                                save_json(USERS_FILE, users, backup=True)
                                 
                                 # Cascade updates to Requests and History
                                 # 1. Update Requests
-                                for app in requests_data["applicants"]:
-                                    if isinstance(app, dict) and app["name"] == old_name:
-                                        app["name"] = edit_name
-                                save_json(REQUESTS_FILE, requests_data)
+                                if edit_name != old_name:
+                                    append_event(REQUESTS_LOG_FILE, {
+                                        "op": "rename",
+                                        "target_date": requests_data["target_date"],
+                                        "old": old_name,
+                                        "new": edit_name
+                                    })
                                 
                                 # 2. Update History
-                                # History entries are strings: "Name (CarType) Time" or "Name (CarType)"
-                                # We need to replace "OldName (OldCar)" with "NewName (NewCar)"
-                                # Robust match: Check if starts with "OldName (" to handle cases where OldCar might differ
-                                
-                                history_updated = False
-                                for h in history:
-                                    for key in ["admin", "tower", "wait"]:
-                                        new_list = []
-                                        for item in h[key]:
-                                            # Match if item starts with "OldName (" or is exactly "OldName"
-                                            # This ignores the old car type in history, forcing an update to the new car type
-                                            if item == old_name or item.startswith(f"{old_name} ("):
-                                                # Try to preserve the time part
-                                                # Split by last closing parenthesis to separate Car info from Time
-                                                parts = item.rsplit(')', 1)
-                                                if len(parts) > 1:
-                                                    # parts[0] is "Name (Car", parts[1] is " Time" or empty
-                                                    time_part = parts[1]
-                                                    new_item = f"{edit_name} ({edit_car}){time_part}"
-                                                else:
-                                                    # No closing paren found, just replace with new format
-                                                    new_item = f"{edit_name} ({edit_car})"
-                                                new_list.append(new_item)
-                                            else:
-                                                new_list.append(item)
-                                        
-                                        if h[key] != new_list:
-                                            h[key] = new_list
-                                            history_updated = True
-                                
-                                if history_updated:
-                                    save_json(HISTORY_FILE, history)
+                                # Slots are records: rename / re-type matching staff records in place.
+                                # This reads every month, so only when name or car type changed
+                                if edit_name != old_name or edit_car != old_car:
+                                    history.rename_staff(old_name, edit_name, edit_car)
+                                    history.save()
                                 
                                 st.session_state[f"editing_user_{idx}"] = False
                                 st.success(f"✅ {edit_name}님의 정보가 수정되고 관련 기록이 업데이트되었습니다!")
@@ -1432,23 +1049,12 @@ else:
                     col2.write(u['car_type'])
                     col3.write(u.get('car_number', '-'))
                     col4.write(u.get('car_details', '-'))
-                    # Calculate Last Parked Date dynamically from history
-                    last_parked_date = "-"
-                    # We iterate through history to find the latest date this user parked
-                    # History is sorted by date usually, but let's be safe
-                    user_dates = []
-                    for h in history:
-                        # Check if user is in admin or tower list
-                        # History items are strings like "Name (Car) Time"
-                        # We match by checking if user name is at the start
-                        for item in h["admin"] + h["tower"]:
-                            if item.startswith(u["name"]):
-                                user_dates.append(h["date"])
-                    
-                    if user_dates:
-                        last_parked_date = max(user_dates)
+                    # Last Parked Date: stored value, or a later (manual) entry from the statistics
+                    last_parked_date = user_stats.last_parked_date(u) or "-"
+                    month_counts = user_stats.month(u["name"], this_month)
                     
                     col5.write(last_parked_date)
+                    col5.caption(f"이번 달 {month_counts['parks']}회 · 대기 {month_counts['waits']}회")
                     
                     if col6.button("✏️", key=f"edit_btn_{idx}"):
                         st.session_state[f"editing_user_{idx}"] = True
@@ -1456,7 +1062,8 @@ else:
                         
                     if col7.button("🗑️", key=f"del_user_{idx}"):
                         users.remove(u)
-                        save_json(USERS_FILE, users)
+                        user_index.pop(u["name"], None)
+                        save_json(USERS_FILE, users, backup=True)
                         st.rerun()
                     
                     # Reduced margin for separator
@@ -1470,6 +1077,13 @@ else:
     with tab3:
         st.markdown("### 배정 히스토리")
         
+        # Multiselect label "Name (CAR)" -> manual staff record
+        staff_option_users = {f"{u['name']} ({u['car_type']})": u for u in users}
+        
+        def manual_records(labels):
+            return [make_record(staff_option_users[label]["name"], staff_option_users[label]["car_type"],
+                                "staff", source="manual") for label in labels]
+        
         # Manual Entry Button
         if st.button("➕ 수동 배정 추가"):
             st.session_state["adding_manual_history"] = True
@@ -1485,19 +1099,14 @@ else:
                 staff_options = [f"{u['name']} ({u['car_type']})" for u in users]
                 
                 st.markdown("**배정 내역 선택** (등록된 직원 중 선택)")
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.markdown("**🏢 관리실**")
-                    manual_admin = st.multiselect("관리실 배정", staff_options, key="manual_admin_select")
-                
-                with col2:
-                    st.markdown("**🅿️ 타워**")
-                    manual_tower = st.multiselect("타워 배정", staff_options, key="manual_tower_select")
+                manual_columns = slot_columns(resolve_zones(capacity_config))
+                manual_slots = {}
                 
-                with col3:
-                    st.markdown("**⏳ 대기**")
-                    manual_wait = st.multiselect("대기 인원", staff_options, key="manual_wait_select")
+                for col, (key, label, _) in zip(st.columns(len(manual_columns)), manual_columns):
+                    with col:
+                        st.markdown(f"**{label}**")
+                        manual_slots[key] = st.multiselect(label, staff_options, key=f"manual_{key}_select",
+                                                           label_visibility="collapsed")
                 
                 col_save, col_cancel = st.columns(2)
                 with col_save:
@@ -1505,20 +1114,14 @@ else:
                         date_str = str(manual_date)
                         
                         # Check if date already exists
-                        existing_idx = next((i for i, h in enumerate(history) if h["date"] == date_str), None)
-                        
-                        if existing_idx is not None:
+                        if date_str in history:
                             st.error(f"{date_str} 날짜의 배정이 이미 존재합니다. 기존 배정을 수정하거나 삭제해주세요.")
                         else:
-                            new_entry = {
-                                "date": date_str,
-                                "admin": manual_admin,
-                                "tower": manual_tower,
-                                "wait": manual_wait
-                            }
-                            history.append(new_entry)
-                            history.sort(key=lambda x: x["date"])
-                            save_json(HISTORY_FILE, history)
+                            new_entry = {"date": date_str}
+                            for key, labels in manual_slots.items():
+                                new_entry[key] = manual_records(labels)
+                            history.upsert(new_entry)
+                            history.save()
                             st.session_state["adding_manual_history"] = False
                             st.success(f"✅ {date_str} 배정이 추가되었습니다!")
                             st.rerun()
@@ -1537,13 +1140,12 @@ else:
             col_filter1, col_filter2, col_filter3 = st.columns([2, 2, 1])
             
             with col_filter1:
-                all_dates = sorted([datetime.strptime(h["date"], "%Y-%m-%d").date() for h in history], reverse=True)
-                if all_dates:
-                    start_date = st.date_input("시작 날짜", value=all_dates[-1])
+                first_date = datetime.strptime(history.first_date, "%Y-%m-%d").date()
+                start_date = st.date_input("시작 날짜", value=first_date)
             
             with col_filter2:
-                if all_dates:
-                    end_date = st.date_input("종료 날짜", value=all_dates[0])
+                last_date = datetime.strptime(history.last_date, "%Y-%m-%d").date()
+                end_date = st.date_input("종료 날짜", value=last_date)
             
             with col_filter3:
                 if st.button("🔍 필터 적용"):
@@ -1562,11 +1164,14 @@ else:
         # Display History
         if history:
             # Apply filter if set
-            filtered_history = history
             if st.session_state.get("filter_applied", False):
                 filter_start = st.session_state.get("filter_start")
                 filter_end = st.session_state.get("filter_end")
-                filtered_history = [h for h in history if filter_start <= h["date"] <= filter_end]
+                filtered_history = history.range(filter_start, filter_end)
+            else:
+                # Unfiltered: current month only; older months load when the filter reaches them
+                filtered_history = history.month(month_of(str(get_kst_time().date())))
+                st.caption("이번 달 배정 내역입니다. 이전 내역은 날짜 필터로 조회하세요.")
             
             if not filtered_history:
                 st.info("선택한 기간에 배정 내역이 없습니다.")
@@ -1593,8 +1198,10 @@ else:
                             col_yes, col_no = st.columns(2)
                             with col_yes:
                                 if st.button("✅ 예", key=f"confirm_yes_{h['date']}"):
-                                    history.remove(h)
-                                    save_json(HISTORY_FILE, history)
+                                    history.remove(h["date"])
+                                    history.save()
+                                    # Let 배정 계산 실행 allocate this date again
+                                    release_run(get_site(capacity_config)["id"], h["date"])
                                     st.session_state[f"confirm_del_hist_{h['date']}"] = False
                                     st.success("✅ 삭제되었습니다!")
                                     st.rerun()
@@ -1611,40 +1218,16 @@ else:
                                 # Create staff options list
                                 staff_options = [f"{u['name']} ({u['car_type']})" for u in users]
                                 
-                                # Helper function to extract base name from history format
-                                def extract_base_name(name_str):
-                                    # Format: "Name (CarType) Time" or "Name (CarType) 수동입력"
-                                    # Extract "Name (CarType)" part
-                                    parts = name_str.rsplit(' ', 1)  # Split from right
-                                    if len(parts) == 2:
-                                        last_part = parts[1]
-                                        if ':' in last_part or last_part == '수동입력':
-                                            return parts[0]  # Return "Name (CarType)"
-                                    return name_str  # Return as-is if no time found
-                                
-                                # Extract base names and filter valid options
-                                admin_defaults = [extract_base_name(item) for item in h["admin"]]
-                                admin_defaults = [item for item in admin_defaults if item in staff_options]
-                                
-                                tower_defaults = [extract_base_name(item) for item in h["tower"]]
-                                tower_defaults = [item for item in tower_defaults if item in staff_options]
+                                edit_columns = slot_columns(resolve_zones(capacity_config, h["date"]), h)
+                                edit_slots = {}
                                 
-                                wait_defaults = [extract_base_name(item) for item in h["wait"]]
-                                wait_defaults = [item for item in wait_defaults if item in staff_options]
-                                
-                                col1, col2, col3 = st.columns(3)
-                                
-                                with col1:
-                                    st.markdown("**🏢 관리실**")
-                                    edit_admin = st.multiselect("관리실", staff_options, default=admin_defaults, key=f"edit_admin_{h['date']}", label_visibility="collapsed")
-                                
-                                with col2:
-                                    st.markdown("**🅿️ 타워**")
-                                    edit_tower = st.multiselect("타워", staff_options, default=tower_defaults, key=f"edit_tower_{h['date']}", label_visibility="collapsed")
-                                
-                                with col3:
-                                    st.markdown("**⏳ 대기**")
-                                    edit_wait = st.multiselect("대기", staff_options, default=wait_defaults, key=f"edit_wait_{h['date']}", label_visibility="collapsed")
+                                for col, (key, label, _) in zip(st.columns(len(edit_columns)), edit_columns):
+                                    with col:
+                                        # Current slots as option labels (guests / removed staff are not selectable)
+                                        defaults = [option_label(r, user_index) for r in h.get(key, [])]
+                                        defaults = [item for item in defaults if item in staff_options]
+                                        st.markdown(f"**{label}**")
+                                        edit_slots[key] = st.multiselect(label, staff_options, default=defaults, key=f"edit_{key}_{h['date']}", label_visibility="collapsed")
                                 
                                 col_save, col_cancel = st.columns(2)
                                 with col_save:
@@ -1654,11 +1237,12 @@ else:
                                 
                                 # Handle form submission outside the columns
                                 if submit_save:
-                                    # Save with "Name (CarType) 수동입력" format for edited entries
-                                    h["admin"] = [f"{item} 수동입력" for item in edit_admin]
-                                    h["tower"] = [f"{item} 수동입력" for item in edit_tower]
-                                    h["wait"] = [f"{item} 수동입력" for item in edit_wait]
-                                    save_json(HISTORY_FILE, history)
+                                    # Edited entries become manual records (shown as "... 수동입력")
+                                    history.upsert({
+                                        **h,
+                                        **{key: manual_records(labels) for key, labels in edit_slots.items()}
+                                    })
+                                    history.save()
                                     st.session_state[f"editing_hist_{h['date']}"] = False
                                     st.success("✅ 저장되었습니다!")
                                     st.rerun()
@@ -1668,32 +1252,71 @@ else:
                                     st.rerun()
                         else:
                             # Display current allocation
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.markdown("**🏢 관리실**")
-                                for item in h["admin"]:
-                                    st.write(f"• {item}")
-                                if not h["admin"]:
-                                    st.caption("(배정 없음)")
-                            with col2:
-                                st.markdown("**🅿️ 타워**")
-                                for item in h["tower"]:
-                                    st.write(f"• {item}")
-                                if not h["tower"]:
-                                    st.caption("(배정 없음)")
-                            with col3:
-                                st.markdown("**⏳ 대기**")
-                                for item in h["wait"]:
-                                    st.write(f"• {item}")
-                                if not h["wait"]:
-                                    st.caption("(대기 없음)")
+                            columns = slot_columns(resolve_zones(capacity_config, h["date"]), h)
+                            for col, (key, label, _) in zip(st.columns(len(columns)), columns):
+                                with col:
+                                    st.markdown(f"**{label}**")
+                                    for item in h.get(key, []):
+                                        st.write(f"• {display_name(item, user_index=user_index)}")
+                                    if not h.get(key):
+                                        st.caption("(대기 없음)" if key == "wait" else "(배정 없음)")
         else:
             st.info("히스토리가 없습니다.")
     
     # ============================================
-    # TAB 4: Data Management
+    # TAB 4: Statistics
     # ============================================
     with tab4:
+        st.markdown("### 통계")
+        
+        if history:
+            # Long-form frame of the whole archive, cached until history changes (see analytics.py)
+            stats_df = analytics.load_frame(history)
+            
+            period = st.radio("기간", ["최근 1개월", "최근 3개월", "최근 1년", "전체"], index=1, horizontal=True,
+                              key="stats_period")
+            period_days = {"최근 1개월": 30, "최근 3개월": 91, "최근 1년": 365}.get(period)
+            period_start = now_kst.date() - timedelta(days=period_days) if period_days else None
+            stats_df = analytics.filter_period(stats_df, start=period_start)
+            
+            if stats_df.empty:
+                st.info("선택한 기간의 배정 기록이 없습니다.")
+            else:
+                daily = analytics.daily_summary(stats_df)
+                utilization = analytics.zone_utilization(stats_df, capacity_config)
+                
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("배정일", f"{len(daily)}일")
+                m2.metric("평균 신청", f"{daily['applicants'].mean():.1f}명")
+                m3.metric("평균 가동률", f"{utilization.to_numpy().mean():.0%}")
+                m4.metric("대기 비율", f"{daily['waits'].sum() / daily['applicants'].sum():.0%}")
+                
+                st.markdown("#### 구역별 가동률")
+                zone_names = {z["id"]: z["name"] for z in get_site(capacity_config)["zones"]}
+                st.line_chart(utilization.rename(columns=zone_names))
+                
+                st.markdown("#### 요일별 패턴")
+                weekday = analytics.weekday_pattern(stats_df)
+                st.bar_chart(weekday[["applicants", "waits"]].rename(columns={"applicants": "신청", "waits": "대기"}))
+                
+                st.markdown("#### 직원별 주차 비율")
+                share = analytics.person_share(stats_df)
+                share[["wait_rate", "share"]] *= 100
+                st.dataframe(
+                    share.rename(columns={"parks": "주차", "waits": "대기", "wait_rate": "대기 비율", "share": "점유율"}),
+                    use_container_width=True,
+                    column_config={
+                        "대기 비율": st.column_config.NumberColumn(format="%.0f%%"),
+                        "점유율": st.column_config.NumberColumn(format="%.1f%%")
+                    }
+                )
+        else:
+            st.info("히스토리가 없습니다.")
+    
+    # ============================================
+    # TAB 5: Data Management
+    # ============================================
+    with tab5:
         st.markdown("### 데이터 관리")
         
         st.warning("⚠️ 위험 구역")
@@ -1706,8 +1329,7 @@ else:
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("✅ 예, 초기화합니다", type="primary"):
-                    if os.path.exists(REQUESTS_FILE):
-                        os.remove(REQUESTS_FILE)
+                    reset_requests(REQUESTS_FILE, REQUESTS_LOG_FILE, target_date)
                     st.session_state["confirm_reset"] = False
                     st.success("✅ 신청 내역이 초기화되었습니다!")
                     st.rerun()
@@ -1718,18 +1340,33 @@ else:
         
         st.divider()
         
+        # Columnar export for BI (incremental: only months changed since the last export)
+        st.markdown("#### 📦 BI 내보내기 (Parquet)")
+        st.caption(f"히스토리와 일별 신청 내역을 월별 Parquet 파일로 `{parquet_export.EXPORT_DIR}/`에 저장합니다.")
+        if st.button("📦 Parquet 내보내기"):
+            exported_months = parquet_export.export(history, user_index)
+            if exported_months:
+                st.success(f"✅ {len(exported_months)}개월 내보내기 완료: {', '.join(exported_months)}")
+            else:
+                st.info("변경된 월이 없습니다. 이미 최신 상태입니다.")
+        
+        st.divider()
+        
         # Current Applications
         st.markdown("#### 현재 신청 현황")
         
         if requests_data["applicants"]:
             st.markdown("**직원 신청**")
             for app in requests_data["applicants"]:
-                name = app["name"] if isinstance(app, dict) else app
+                name = applicant_name(app)
                 col1, col2 = st.columns([5, 1])
                 col1.write(name)
                 if col2.button("X", key=f"del_app_{name}"):
-                    requests_data["applicants"].remove(app)
-                    save_json(REQUESTS_FILE, requests_data)
+                    append_event(REQUESTS_LOG_FILE, {
+                        "op": "cancel",
+                        "target_date": requests_data["target_date"],
+                        "name": name
+                    })
                     st.rerun()
         
         if requests_data["guests"]:
@@ -1738,6 +1375,10 @@ else:
                 col1, col2 = st.columns([5, 1])
                 col1.write(f"{g['name']} - {g['researcher']}")
                 if col2.button("X", key=f"del_guest_{i}"):
-                    requests_data["guests"].pop(i)
-                    save_json(REQUESTS_FILE, requests_data)
+                    # Match by content: indexes may have shifted since this page was rendered
+                    append_event(REQUESTS_LOG_FILE, {
+                        "op": "remove_guest",
+                        "target_date": requests_data["target_date"],
+                        "guest": g
+                    })
                     st.rerun()
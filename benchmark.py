@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Allocation Benchmarks
+Generates synthetic users / requests / history at several scales and times the
+allocation engine, history lookups, load/save and Slack rendering.
+Everything runs in a temporary directory; the real data files are never touched.
+
+    python benchmark.py                                   # 10, 1k, 100k, 1M
+    python benchmark.py --scales 10,1000 --output bench.json
+    python benchmark.py --baseline bench.json             # exit 1 on regressions
+
+Scale N = N users, ~60% of them applying (5% guests on top), and ~N slot records
+of history (5 per day). Results are JSON: one row per (scale, benchmark) with
+the best and median time of the repeats.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import storage
+from allocation import AllocationQueue, allocate, build_candidates, get_capacity, index_users
+from capacity import DEFAULT_CONFIG
+from history_store import HistoryIndex, PartitionedHistory
+from records import make_record
+from request_log import REQUESTS_LOG_FILE, append_event, load_requests
+from slack_message import render_allocation
+
+DEFAULT_SCALES = (10, 1000, 100_000, 1_000_000)
+TARGET_DATE = "2025-06-02"
+
+SUV_RATIO = 0.3
+APPLY_RATIO = 0.6
+GUEST_RATIO = 0.05
+GUEST_LOCATIONS = [("상관없음(ANY)", 0.5), ("타워(TOWER)", 0.3), ("관리실(ADMIN)", 0.2)]
+RECORDS_PER_DAY = 5
+
+# Optimal solver / many-zone runs above this size only with --all
+OPTIMAL_MAX_SCALE = 100_000
+
+
+# --- Synthetic data ---
+def gen_users(n, rng):
+    start = date.fromisoformat(TARGET_DATE)
+    users = []
+    for i in range(n):
+        last = None if rng.random() < 0.2 else str(start - timedelta(days=rng.randint(1, 60)))
+        users.append({
+            "name": f"user{i:07d}",
+            "car_type": "SUV" if rng.random() < SUV_RATIO else "SEDAN",
+            "car_number": f"{rng.randint(10, 999)}가{rng.randint(1000, 9999)}",
+            "car_details": "",
+            "last_parked_date": last
+        })
+    return users
+
+
+def _timestamp(rng):
+    # Applications pile up in the last hour before the 08:00 cutoff
+    day = date.fromisoformat(TARGET_DATE) - timedelta(days=1)
+    return datetime(day.year, day.month, day.day, 7, 0) + timedelta(seconds=rng.randint(0, 3599))
+
+
+def gen_requests(users, rng):
+    applicants = [{"name": u["name"], "timestamp": _timestamp(rng).isoformat()}
+                  for u in users if rng.random() < APPLY_RATIO]
+    guests = []
+    for i in range(int(len(applicants) * GUEST_RATIO) or (1 if users else 0)):
+        car_type = "SUV" if rng.random() < SUV_RATIO else "SEDAN"
+        if car_type == "SUV":
+            location = "관리실(ADMIN)"
+        else:
+            location = rng.choices([loc for loc, _ in GUEST_LOCATIONS], [w for _, w in GUEST_LOCATIONS])[0]
+        guests.append({"name": f"guest{i:06d}", "car_type": car_type, "location": location,
+                       "reason": "미팅", "researcher": "bench", "timestamp": _timestamp(rng).isoformat()})
+    return {"target_date": TARGET_DATE, "applicants": applicants, "guests": guests, "sante_opt_out": False}
+
+
+def gen_history(n_records, users, rng):
+    days = max(1, n_records // RECORDS_PER_DAY)
+    day = date.fromisoformat(TARGET_DATE)
+    entries = []
+    for _ in range(days):
+        day -= timedelta(days=1)
+        picked = [users[rng.randrange(len(users))] for _ in range(RECORDS_PER_DAY)]
+        records = [make_record(u["name"], u["car_type"], applied_at=_timestamp(rng).isoformat()) for u in picked]
+        entries.append({"date": str(day), "tower": records[:2], "admin": records[2:3], "wait": records[3:]})
+    entries.reverse()
+    return entries
+
+
+def scaled_capacity(n_candidates, zones=20):
+    # Many zones, room for about half of the candidates
+    slots = max(1, n_candidates // (2 * zones))
+    return [{"id": f"z{i:02d}", "name": f"구역{i:02d}", "slots": slots, "icon": "🅿️", "display": i,
+             "car_types": ["SEDAN"] if i % 3 else ["SEDAN", "SUV"]} for i in range(zones)]
+
+
+# --- Timing ---
+def timed(fn, repeats, setup=None):
+    runs = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def run_scale(n, repeats, rng, run_all=False):
+    results = {}
+
+    def record(name, runs, ops=1):
+        results[name] = {"best": min(runs) / ops, "median": statistics.median(runs) / ops,
+                         "repeats": len(runs), "ops": ops}
+
+    users = gen_users(n, rng)
+    user_index = index_users(users)
+    requests_data = gen_requests(users, rng)
+    history_entries = gen_history(n, users, rng)
+    n_candidates = len(requests_data["applicants"]) + len(requests_data["guests"])
+    big = n > OPTIMAL_MAX_SCALE and not run_all
+    reps = 1 if n >= 1_000_000 else repeats
+
+    # Allocation engine
+    default_capacity = get_capacity(DEFAULT_CONFIG, TARGET_DATE)
+    many_zones = scaled_capacity(n_candidates)
+    record("allocate.build_candidates", timed(lambda: build_candidates(requests_data, users, user_index), reps))
+    record("allocate.greedy.default", timed(
+        lambda: allocate(requests_data, users, default_capacity, TARGET_DATE, user_index), reps))
+    record("allocate.greedy.zones20", timed(
+        lambda: allocate(requests_data, users, many_zones, TARGET_DATE, user_index), reps))
+    if not big:
+        record("allocate.optimal.zones20", timed(
+            lambda: allocate(requests_data, users, many_zones, TARGET_DATE, user_index, solver="optimal"), reps))
+
+    staff_c, guest_c = build_candidates(requests_data, users, user_index, sort=False)
+    queue = AllocationQueue(many_zones)
+    for c in guest_c + staff_c:
+        queue.push(c)
+    queue.run()
+    late = [dict(staff_c[rng.randrange(len(staff_c))], name=f"late{i}") for i in range(100)] if staff_c else []
+
+    def late_inserts():
+        for c in late:
+            queue.push(c)
+            queue.run()
+    if late:
+        record("allocate.queue.late_insert", timed(late_inserts, 1), ops=len(late))
+
+    entry, _ = allocate(requests_data, users, many_zones, TARGET_DATE, user_index)
+    record("slack.render.zones20", timed(lambda: render_allocation(entry, many_zones, user_index), repeats))
+    default_entry, _ = allocate(requests_data, users, default_capacity, TARGET_DATE, user_index)
+    record("slack.render.default", timed(
+        lambda: render_allocation(default_entry, default_capacity, user_index), repeats))
+
+    # Load / save
+    def drop_cache():
+        storage._json_cache.clear()
+    record("storage.save.users", timed(lambda: storage.save_json("users.json", users, backup=True), reps))
+    record("storage.load.users.cold", timed(lambda: storage.load_json("users.json", []), reps, setup=drop_cache))
+    record("storage.load.users.warm", timed(lambda: storage.load_json("users.json", []), reps))
+    record("storage.save.requests", timed(lambda: storage.save_json("requests.json", requests_data), reps))
+
+    events = [{"op": "apply", "target_date": TARGET_DATE, "name": f"late{i}",
+               "timestamp": _timestamp(rng).isoformat()} for i in range(200)]
+    record("request_log.append", timed(lambda: [append_event(REQUESTS_LOG_FILE, e) for e in events], 1),
+           ops=len(events))
+    record("request_log.load_requests", timed(
+        lambda: load_requests("requests.json", REQUESTS_LOG_FILE, TARGET_DATE), reps, setup=drop_cache))
+
+    # History
+    storage.save_json("history.json", history_entries)
+    record("history.migrate_partitions", timed(lambda: PartitionedHistory(directory="history_bench"), 1))
+    lookup_dates = [history_entries[rng.randrange(len(history_entries))]["date"] for _ in range(1000)]
+
+    def cold_lookup():
+        archive = PartitionedHistory(directory="history_bench")
+        archive.get(lookup_dates[0])
+    record("history.get.cold", timed(cold_lookup, reps, setup=drop_cache))
+
+    archive = PartitionedHistory(directory="history_bench")
+    if not big:
+        archive.load_all()
+    record("history.get.warm", timed(lambda: [archive.get(d) for d in lookup_dates], repeats),
+           ops=len(lookup_dates))
+    first = history_entries[0]["date"]
+    record("history.range.month", timed(lambda: archive.range(first, first[:7] + "-31"), repeats))
+    record("history.index.build", timed(lambda: HistoryIndex(history_entries), reps))
+
+    return {"n": n, "candidates": n_candidates, "history_days": len(history_entries), "benchmarks": results}
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Benchmarks slower than baseline * tolerance (best times, same scale and name)."""
+    old = {(s["n"], name): b["best"] for s in baseline["scales"] for name, b in s["benchmarks"].items()}
+    regressions = []
+    for s in results["scales"]:
+        for name, b in s["benchmarks"].items():
+            before = old.get((s["n"], name))
+            if before and b["best"] > before * tolerance:
+                regressions.append({"n": s["n"], "name": name, "baseline": before, "best": b["best"],
+                                    "ratio": b["best"] / before})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parking allocation system")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="comma separated user counts (default: 10,1000,100000,1000000)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--all", action="store_true",
+                        help=f"also run the optimal solver / full history load above {OPTIMAL_MAX_SCALE:,}")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="previous JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="fail when a benchmark is this many times slower than the baseline")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "seed": args.seed
+        },
+        "scales": []
+    }
+
+    with tempfile.TemporaryDirectory(prefix="parking-bench-") as workdir:
+        os.chdir(workdir)
+        for n in [int(s) for s in args.scales.split(",")]:
+            scale_dir = os.path.join(workdir, str(n))
+            os.makedirs(scale_dir)
+            os.chdir(scale_dir)
+            storage.configure(args.backend, os.path.join(scale_dir, "bench.db"))
+            started = time.perf_counter()
+            # Progress / migration notices go to stderr so stdout stays pure JSON
+            with contextlib.redirect_stdout(sys.stderr):
+                results["scales"].append(run_scale(n, args.repeats, random.Random(args.seed), args.all))
+            print(f"⏱️ n={n:,} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            results["regressions"] = compare(results, json.load(f), args.tolerance)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    for r in results.get("regressions", []):
+        print(f"❌ n={r['n']:,} {r['name']}: {r['best'] * 1000:.2f}ms vs {r['baseline'] * 1000:.2f}ms "
+              f"({r['ratio']:.1f}x)", file=sys.stderr)
+    if results.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Parking Capacity Configuration
+Sites, zones and slot counts live in capacity.json instead of code:
+
+    sites[].zones[]       {"id", "name", "slots", "car_types", "icon"} - listed in fill order
+                          (a car takes the first zone with a free slot that fits it)
+    sites[].display_order ["admin", "tower"] - zone order in messages / UI (default: fill order)
+    sites[].flags         {"sante_opt_out": {"tower": 1}} - slot deltas while a flag is on
+    sites[].day_overrides {"2025-12-25": {"tower": 0}} - absolute slots for one date
+    sites[].solver        "greedy" (default) | "optimal" - see allocation.allocate
+
+Adding a site or zone is a config change; the allocation engine walks the
+resolved zone list generically.
+"""
+
+import json
+import os
+
+CAPACITY_FILE = "capacity.json"
+
+# Used when capacity.json is missing: the original single-building layout
+DEFAULT_CONFIG = {
+    "default_site": "plabhouse",
+    "sites": [
+        {
+            "id": "plabhouse",
+            "name": "플랩하우스",
+            "zones": [
+                {"id": "tower", "name": "타워", "slots": 2, "car_types": ["SEDAN"], "icon": "🅿️"},
+                {"id": "admin", "name": "관리실", "slots": 1, "car_types": ["SEDAN", "SUV"], "icon": "🏢"}
+            ],
+            "display_order": ["admin", "tower"],
+            "flags": {"sante_opt_out": {"tower": 1}},
+            "day_overrides": {},
+            "solver": "greedy"
+        }
+    ]
+}
+
+
+def load_capacity_config(file_path=CAPACITY_FILE):
+    # Config file, read straight from disk: not a storage document, so the sqlite backend never sees it
+    if not os.path.exists(file_path):
+        return DEFAULT_CONFIG
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return DEFAULT_CONFIG
+
+
+def get_site(config, site_id=None):
+    site_id = site_id or config.get("default_site")
+    for site in config["sites"]:
+        if site_id is None or site["id"] == site_id:
+            return site
+    raise KeyError(f"Unknown site: {site_id}")
+
+
+def resolve_zones(config, date=None, flags=None, site_id=None):
+    """
+    Zones of one site with the slot count that applies on date.
+    Day overrides win over flag deltas.
+    Returns: [{"id", "name", "slots", "car_types", "icon", "display"}] in fill order
+    ("display" is the zone's position in display_order)
+    """
+    site = get_site(config, site_id)
+    day_override = site.get("day_overrides", {}).get(str(date), {}) if date else {}
+    display_order = site.get("display_order") or [z["id"] for z in site["zones"]]
+
+    zones = []
+    for zone in site["zones"]:
+        slots = zone["slots"]
+        for flag, deltas in site.get("flags", {}).items():
+            if flags and flags.get(flag):
+                slots += deltas.get(zone["id"], 0)
+        if zone["id"] in day_override:
+            slots = day_override[zone["id"]]
+        zones.append({
+            "id": zone["id"],
+            "name": zone["name"],
+            "slots": max(slots, 0),
+            "car_types": list(zone["car_types"]),
+            "icon": zone.get("icon", "🅿️"),
+            "display": display_order.index(zone["id"]) if zone["id"] in display_order else len(display_order)
+        })
+    return zones
+
+
+def get_solver(config, site_id=None):
+    return get_site(config, site_id).get("solver", "greedy")
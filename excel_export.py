@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Excel Export
+Streams the staff list and the allocation history into an in-memory .xlsx with
+openpyxl's write-only mode: rows are written as they are generated, nothing is
+built up as a DataFrame and nothing touches the working directory.
+
+The bytes are cached per process, keyed on the data version (users + history
+revision), so repeated clicks reuse the same file until something changes.
+"""
+
+import hashlib
+import io
+import json
+
+from openpyxl import Workbook
+
+from records import slot_keys
+
+MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+KIND_LABELS = {"staff": "직원", "guest": "손님"}
+SOURCE_LABELS = {"auto": "자동", "manual": "수동입력"}
+
+# (version) -> xlsx bytes
+_workbook_cache = {}
+
+
+def data_version(users, history, this_month):
+    # Users have no revision counter: digest their content (cheap next to building the file)
+    users_digest = hashlib.sha1(json.dumps(users, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    return (users_digest, history.version, this_month)
+
+
+def _staff_rows(users, user_stats, zones, this_month):
+    yield ["이름", "차종", "차 번호", "상세 차종", "마지막 주차일", "총 주차"] + \
+          [z["name"] for z in zones] + ["대기", "이번 달 주차", "연속 주차"]
+    for u in users:
+        u_stats = user_stats.get(u["name"]) or {"parks": 0, "waits": 0, "zones": {}}
+        yield [
+            u["name"],
+            u["car_type"],
+            u.get("car_number", ""),
+            u.get("car_details", ""),
+            user_stats.last_parked_date(u) or "",
+            u_stats["parks"]
+        ] + [u_stats["zones"].get(z["id"], 0) for z in zones] + [
+            u_stats["waits"],
+            user_stats.month(u["name"], this_month)["parks"],
+            user_stats.streak(u["name"])
+        ]
+
+
+def _history_rows(entries, zone_names):
+    yield ["날짜", "구역", "이름", "차종", "구분", "입력", "신청 시각"]
+    for h in entries:
+        for key in slot_keys(h):
+            for r in h[key]:
+                yield [
+                    h["date"],
+                    zone_names.get(key, key),
+                    r["name"],
+                    r.get("car_type") or "",
+                    KIND_LABELS.get(r.get("kind"), r.get("kind") or ""),
+                    SOURCE_LABELS.get(r.get("source"), r.get("source") or ""),
+                    r.get("applied_at") or ""
+                ]
+
+
+def build_workbook(users, user_stats, history, zones, this_month):
+    """Staff + history sheets as xlsx bytes (write-only workbook into a BytesIO)."""
+    zone_names = {z["id"]: z["name"] for z in zones}
+    zone_names["wait"] = "대기"
+
+    wb = Workbook(write_only=True)
+    staff_ws = wb.create_sheet("직원")
+    for row in _staff_rows(users, user_stats, zones, this_month):
+        staff_ws.append(row)
+    history_ws = wb.create_sheet("히스토리")
+    for row in _history_rows(history.entries, zone_names):
+        history_ws.append(row)
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def staff_workbook(users, user_stats, history, zones, this_month):
+    # Cached build_workbook: regenerated only when users or history changed
+    version = data_version(users, history, this_month)
+    data = _workbook_cache.get(version)
+    if data is None:
+        data = build_workbook(users, user_stats, history, zones, this_month)
+        _workbook_cache.clear()
+        _workbook_cache[version] = data
+    return data
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Fairness Scores
+Per-person allocation priority from the whole history instead of a single
+last_parked_date:
+
+    score = Σ parks · e^(-λ·age) - WAIT_CREDIT · Σ waits · e^(-λ·age)    (age in days)
+
+Lower score = parked less / waited more lately = allocated first.
+Scores are stored in growth form (each day adds e^(λ·(date - epoch))), so
+appending or removing a day only touches the people in it. All scores share the
+same e^(-λ·(today - epoch)) factor, so the allocator ranks by the stored value.
+
+Also keeps park / wait counts.
+A HistoryView: subscribed to PartitionedHistory, which reports every upsert / remove.
+
+Rebuild from the archive (e.g. after changing the parameters):
+    python fairness.py rebuild
+"""
+
+import math
+import sys
+from datetime import date
+
+from history_store import HistoryView, PartitionedHistory
+from records import slot_keys
+from storage import load_json, save_json
+
+FAIRNESS_FILE = "fairness.json"
+
+HALF_LIFE_DAYS = 28
+WAIT_CREDIT = 0.5  # one wait offsets half a park
+EPOCH = "2024-01-01"
+
+_DECAY = math.log(2) / HALF_LIFE_DAYS
+
+
+def _days(date_str):
+    return (date.fromisoformat(date_str) - date.fromisoformat(EPOCH)).days
+
+
+class FairnessIndex(HistoryView):
+    """
+    fairness.json:
+        {"params": {...}, "people": {name: {"score", "parks", "waits"}}}
+    """
+    PARAMS = {"half_life_days": HALF_LIFE_DAYS, "wait_credit": WAIT_CREDIT, "epoch": EPOCH}
+
+    def __init__(self, file_path=FAIRNESS_FILE, history=None):
+        super().__init__(file_path, history)
+
+    @staticmethod
+    def summarize(entry):
+        # Staff only: guests do not accumulate priority
+        parked, waited = [], []
+        for key in slot_keys(entry):
+            names = [r["name"] for r in entry[key] if r.get("kind") == "staff"]
+            (waited if key == "wait" else parked).extend(names)
+        return {"date": entry["date"], "parked": parked, "waited": waited}
+
+    @staticmethod
+    def apply(data, op):
+        people = data["people"]
+        if op[0] == "rename":
+            _, old, new = op
+            if old in people:
+                people[new] = people.pop(old)
+            return
+
+        _, summary, sign = op
+        weight = math.exp(_DECAY * _days(summary["date"]))
+        for names, delta, counter in ((summary["parked"], weight, "parks"),
+                                      (summary["waited"], -WAIT_CREDIT * weight, "waits")):
+            for name in names:
+                p = people.setdefault(name, {"score": 0.0, "parks": 0, "waits": 0})
+                p["score"] += sign * delta
+                p[counter] += sign
+                if p["parks"] <= 0 and p["waits"] <= 0:
+                    del people[name]
+
+    # --- Read ---
+    def scores(self):
+        # name -> growth-form score, comparable across people (see module docstring)
+        return {name: p["score"] for name, p in self.data["people"].items()}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python fairness.py rebuild")
+        sys.exit(1)
+    users = load_json("users.json", [])
+    archive = PartitionedHistory(user_index={u["name"]: u for u in users})
+    data = FairnessIndex.build(archive.entries)
+    save_json(FAIRNESS_FILE, data)
+    print(f"✅ Fairness scores rebuilt for {len(data['people'])} people from {len(archive)} days")
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+Date-indexed History
+Wraps the list of history entries ({"date", "admin", "tower", "wait"}) so that
+lookups by date are O(1) and date-range queries are O(log n + k).
+Entries are kept sorted by date (ascending), one entry per date.
+
+PartitionedHistory stores the archive as one file per month under history/
+plus a small manifest, and only loads the months that are actually asked for.
+Slots are structured records (records.py); old display-string entries are
+converted as their month is loaded and written back on the next save.
+
+Convert the whole archive at once:
+    python history_store.py migrate
+"""
+
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from contextlib import ExitStack
+
+from records import migrate_entry, slot_keys
+from storage import JsonBackend, file_lock, get_backend, load_json, save_json, update_json
+
+HISTORY_DIR = "history"
+MANIFEST_FILE = "manifest.json"
+LEGACY_HISTORY_FILE = "history.json"
+MIGRATED_SUFFIX = ".migrated"  # history.json is renamed once its entries are partitioned
+
+
+class HistoryIndex:
+    def __init__(self, entries=None):
+        # One entry per date (last one wins for legacy duplicates), sorted once on load
+        self._by_date = {}
+        for h in entries or []:
+            self._by_date[h["date"]] = h
+        self._dates = sorted(self._by_date)
+
+    # --- Read ---
+    def get(self, date_str):
+        return self._by_date.get(date_str)
+
+    def __contains__(self, date_str):
+        return date_str in self._by_date
+
+    def range(self, start, end):
+        """Entries with start <= date <= end (ISO date strings), ascending."""
+        lo = bisect_left(self._dates, start)
+        hi = bisect_right(self._dates, end)
+        return [self._by_date[d] for d in self._dates[lo:hi]]
+
+    @property
+    def entries(self):
+        # Ascending list, also the on-disk order
+        return [self._by_date[d] for d in self._dates]
+
+    @property
+    def first_date(self):
+        return self._dates[0] if self._dates else None
+
+    @property
+    def last_date(self):
+        return self._dates[-1] if self._dates else None
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self._dates)
+
+    def __bool__(self):
+        return bool(self._dates)
+
+    # --- Write ---
+    def upsert(self, entry):
+        """Insert or replace the entry for entry["date"] without re-sorting."""
+        date_str = entry["date"]
+        if date_str not in self._by_date:
+            self._dates.insert(bisect_left(self._dates, date_str), date_str)
+        self._by_date[date_str] = entry
+
+    def remove(self, date_str):
+        if self._by_date.pop(date_str, None) is not None:
+            del self._dates[bisect_left(self._dates, date_str)]
+
+
+def month_of(date_str):
+    return date_str[:7]  # "YYYY-MM"
+
+
+class PartitionedHistory(HistoryIndex):
+    """
+    Month-partitioned history archive:
+        history/manifest.json   {"months": {"2025-11": {"count", "first", "last", "rev"}}}
+        history/2025-11.json    [entries of that month]
+    Months are loaded on first access (get / range / upsert); entries and
+    iteration load everything. save() writes only the months that changed: under
+    the month's lock it re-reads the file and applies just the dates this instance
+    changed, so concurrent sessions do not overwrite each other.
+    """
+
+    def __init__(self, directory=HISTORY_DIR, eager_months=(), legacy_file=LEGACY_HISTORY_FILE,
+                 user_index=None):
+        super().__init__()
+        self.directory = directory
+        self.user_index = user_index  # lets legacy migration tell staff from guests
+        self._loaded = set()
+        self._dirty = set()  # months to write back
+        self._changed = {}  # month -> dates upserted / removed / touched here since the last save
+        self._listeners = []
+
+        manifest = load_json(self._manifest_path(), None)
+        if manifest is None:
+            # Lost manifest: its backup (one save behind) still lists the partitions
+            manifest = load_json(self._manifest_path() + ".bak", None)
+        if manifest is None:
+            manifest = self._migrate(legacy_file)
+        self._months = manifest.get("months", {})
+
+        for month in eager_months:
+            self._ensure_month(month)
+
+    # --- Partition files ---
+    def _manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def _month_path(self, month):
+        return os.path.join(self.directory, f"{month}.json")
+
+    def _mark(self, date_str):
+        month = month_of(date_str)
+        self._dirty.add(month)
+        self._changed.setdefault(month, set()).add(date_str)
+
+    def _ensure_month(self, month):
+        if month in self._loaded:
+            return
+        self._loaded.add(month)
+        if month in self._months:
+            for h in load_json(self._month_path(month), []):
+                if migrate_entry(h, self.user_index):
+                    self._dirty.add(month)
+                super().upsert(h)
+
+    def _ensure_range(self, start, end):
+        for month in self._months:
+            if month_of(start) <= month <= month_of(end):
+                self._ensure_month(month)
+
+    def _migrate(self, legacy_file):
+        # One-time split of the old single history.json into monthly partitions
+        os.makedirs(self.directory, exist_ok=True)
+        legacy = HistoryIndex(load_json(legacy_file, []))
+        self._months = {}
+        for h in legacy.entries:
+            migrate_entry(h, self.user_index)
+            super().upsert(h)
+            self._mark(h["date"])
+        self._loaded.update(self._dirty)
+        self.save()
+        if legacy:
+            print(f"📦 Migrated {len(legacy)} history entries from {legacy_file} into {self.directory}/")
+            # Retire the old file, so a later migration cannot bring its stale entries back.
+            # (Under sqlite history.json and the partitions are the same table: nothing to retire.)
+            if isinstance(get_backend(), JsonBackend) and os.path.exists(legacy_file):
+                os.replace(legacy_file, legacy_file + MIGRATED_SUFFIX)
+        return {"months": self._months}
+
+    # --- Read ---
+    def get(self, date_str):
+        self._ensure_month(month_of(date_str))
+        return super().get(date_str)
+
+    def __contains__(self, date_str):
+        return self.get(date_str) is not None
+
+    def range(self, start, end):
+        self._ensure_range(start, end)
+        return super().range(start, end)
+
+    def month(self, month):
+        # Entries of one "YYYY-MM" month
+        return self.range(f"{month}-01", f"{month}-31")
+
+    def load_all(self):
+        for month in self._months:
+            self._ensure_month(month)
+
+    @property
+    def entries(self):
+        self.load_all()
+        return super().entries
+
+    @property
+    def first_date(self):
+        return min((m["first"] for m in self._months.values()), default=None)
+
+    @property
+    def last_date(self):
+        return max((m["last"] for m in self._months.values()), default=None)
+
+    @property
+    def loaded_entries(self):
+        # Only what is already in memory - never touches disk
+        return HistoryIndex.entries.fget(self)
+
+    @property
+    def version(self):
+        # Changes whenever any month is saved (manifest "rev" per month); cache key for derived data
+        return tuple((month, m["count"], m.get("rev", 0)) for month, m in sorted(self._months.items()))
+
+    def __len__(self):
+        return sum(m["count"] for m in self._months.values())
+
+    def __bool__(self):
+        return bool(self._months)
+
+    # --- Derived views ---
+    def subscribe(self, listener):
+        """
+        Keep a derived view (HistoryView, e.g. fairness.FairnessIndex) in step with the archive.
+        listener.on_change(old_entry, new_entry) runs on every upsert / remove,
+        listener.rename(old, new) on rename_staff, listener.save() on save().
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, old_entry, new_entry):
+        for listener in self._listeners:
+            listener.on_change(old_entry, new_entry)
+
+    # --- Write ---
+    def upsert(self, entry):
+        # Pass a new entry object: listeners diff it against the stored one
+        month = month_of(entry["date"])
+        self._ensure_month(month)
+        old_entry = super().get(entry["date"])
+        super().upsert(entry)
+        self._mark(entry["date"])
+        self._notify(old_entry, entry)
+
+    def remove(self, date_str):
+        month = month_of(date_str)
+        self._ensure_month(month)
+        old_entry = super().get(date_str)
+        super().remove(date_str)
+        self._mark(date_str)
+        if old_entry is not None:
+            self._notify(old_entry, None)
+
+    def touch(self, date_str):
+        # Mark an entry edited in place so save() writes it
+        self._mark(date_str)
+
+    def rename_staff(self, old_name, new_name, car_type):
+        """Rename / re-type a staff member's records across the whole archive. Returns True if any changed."""
+        updated = False
+        for h in self.entries:
+            for key in slot_keys(h):
+                for r in h[key]:
+                    if r["kind"] == "staff" and r["name"] == old_name:
+                        r["name"] = new_name
+                        r["car_type"] = car_type
+                        self.touch(h["date"])
+                        updated = True
+        if new_name != old_name:
+            for listener in self._listeners:
+                listener.rename(old_name, new_name)
+        return updated
+
+    def save(self):
+        for listener in self._listeners:
+            listener.save()
+        if not self._dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Month locks (sorted, so writers never deadlock), then the manifest: counts are
+        # taken from the merged files and written before another session can change them
+        with ExitStack() as locks:
+            for month in sorted(self._dirty):
+                locks.enter_context(file_lock(self._month_path(month)))
+            locks.enter_context(file_lock(self._manifest_path()))
+            months = load_json(self._manifest_path(), {"months": {}})["months"]
+            for month in sorted(self._dirty):
+                month_entries = self._merge_month(month)
+                save_json(self._month_path(month), month_entries, backup=True)
+                if month_entries:
+                    months[month] = {
+                        "count": len(month_entries),
+                        "first": month_entries[0]["date"],
+                        "last": month_entries[-1]["date"],
+                        "rev": months.get(month, {}).get("rev", 0) + 1
+                    }
+                else:
+                    months.pop(month, None)
+            self._months = dict(sorted(months.items()))
+            save_json(self._manifest_path(), {"months": self._months}, backup=True)
+        self._dirty.clear()
+        self._changed.clear()
+
+    def _merge_month(self, month):
+        # The latest file (other sessions may have saved since we loaded it) with this
+        # instance's changes on top; the in-memory copy is brought up to date as well
+        merged = HistoryIndex(load_json(self._month_path(month), []))
+        for h in merged.entries:
+            migrate_entry(h, self.user_index)
+        for date_str in self._changed.get(month, ()):
+            entry = HistoryIndex.get(self, date_str)
+            if entry is None:
+                merged.remove(date_str)
+            else:
+                merged.upsert(entry)
+
+        for h in HistoryIndex.range(self, f"{month}-01", f"{month}-31"):
+            if h["date"] not in merged:
+                HistoryIndex.remove(self, h["date"])
+        for h in merged.entries:
+            HistoryIndex.upsert(self, h)
+        self._loaded.add(month)
+        return merged.entries
+
+
+class HistoryView:
+    """
+    Base for derived views kept in step with the archive (see PartitionedHistory.subscribe),
+    stored as one JSON document: {"params": {...}, "people": {name: {...}}}.
+
+    Subclasses define PARAMS, summarize(entry) and apply(data, op), where op is
+    ("entry", summary, +1 / -1) or ("rename", old, new). Changes are applied in
+    memory right away and replayed onto the latest file under a lock at save(),
+    so concurrent sessions do not overwrite each other.
+    """
+    PARAMS = {}
+
+    def __init__(self, file_path, history=None):
+        self.file_path = file_path
+        self._pending = []
+
+        self.data = load_json(file_path, None)
+        if self.data is None or self.data.get("params") != self.PARAMS:
+            self.data = self.empty()
+            if history is not None:
+                # First run or new parameters: one full pass over the archive
+                self.data = self.build(history.entries)
+                save_json(file_path, self.data)
+
+    @classmethod
+    def empty(cls):
+        return {"params": dict(cls.PARAMS), "people": {}}
+
+    @classmethod
+    def build(cls, entries):
+        data = cls.empty()
+        for entry in entries:
+            cls.apply(data, ("entry", cls.summarize(entry), +1))
+        return data
+
+    @staticmethod
+    def summarize(entry):
+        raise NotImplementedError
+
+    @staticmethod
+    def apply(data, op):
+        raise NotImplementedError
+
+    def get(self, name):
+        return self.data["people"].get(name)
+
+    # --- Listener interface ---
+    def _record(self, op):
+        self.apply(self.data, op)
+        self._pending.append(op)
+
+    def on_change(self, old_entry, new_entry):
+        if old_entry is not None:
+            self._record(("entry", self.summarize(old_entry), -1))
+        if new_entry is not None:
+            self._record(("entry", self.summarize(new_entry), +1))
+
+    def rename(self, old_name, new_name):
+        self._record(("rename", old_name, new_name))
+
+    def save(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        def replay(data):
+            for op in pending:
+                self.apply(data, op)
+
+        self.data, _ = update_json(self.file_path, self.empty(), replay)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python history_store.py migrate")
+        sys.exit(1)
+    users = load_json("users.json", [])
+    archive = PartitionedHistory(user_index={u["name"]: u for u in users})
+    archive.load_all()  # converts every month as it loads
+    changed = len(archive._dirty)
+    archive.save()
+    print(f"✅ {len(archive)} history entries, {changed} month(s) converted to structured records")
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Load Test
+Drives N headless app sessions (streamlit.testing AppTest) against a scratch copy of
+the data files, the way the 07:59 rush looks: every session opens the main page,
+opens a form and submits either "직원 신청" or "외부인 신청" at roughly the same time.
+
+Afterwards the requests view (requests.json + log) is folded into requests.json and
+checked: every submitted applicant / guest must be there exactly once.
+
+    python loadtest.py --sessions 200 --concurrency 16
+    python loadtest.py --sessions 50 --guests 0.2 --output load.json
+
+Sessions run in separate processes (like separate Streamlit server threads, but
+without sharing the GIL), so file locking and caches see real contention.
+Reports p50/p99 rerun latency per step and submission throughput as JSON.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from request_log import REQUESTS_LOG_FILE, applicant_name, compact, read_events
+from storage import save_json
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(APP_DIR, "app.py")
+RUN_TIMEOUT = 60
+
+
+# --- Session scripts ---
+def _button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def _timed_run(at, timings, step):
+    start = time.perf_counter()
+    at.run()
+    timings.append((step, time.perf_counter() - start))
+    if at.exception:
+        raise RuntimeError(f"{step}: {at.exception[0].message}")
+
+
+def staff_session(index, user_label):
+    from streamlit.testing.v1 import AppTest
+
+    timings = []
+    at = AppTest.from_file(APP_FILE, default_timeout=RUN_TIMEOUT)
+    _timed_run(at, timings, "open")
+    at.button(key="card_staff").click()
+    _timed_run(at, timings, "open_form")
+    at.selectbox(key="staff_selector").select(user_label)
+    _button(at, "신청하기").click()
+    _timed_run(at, timings, "submit_staff")
+    return timings
+
+
+def guest_session(index, guest_name):
+    from streamlit.testing.v1 import AppTest
+
+    timings = []
+    at = AppTest.from_file(APP_FILE, default_timeout=RUN_TIMEOUT)
+    _timed_run(at, timings, "open")
+    at.button(key="card_guest").click()
+    _timed_run(at, timings, "open_form")
+    at.radio(key="guest_car_type").set_value("SEDAN" if index % 3 else "SUV")
+    inputs = {t.label: t for t in at.text_input}
+    inputs["손님 성함/정보 (필수)"].input(guest_name)
+    inputs["등록 리서처 (필수)"].input("loadtest")
+    inputs["방문 목적 (필수)"].input("미팅")
+    _button(at, "등록하기").click()
+    _timed_run(at, timings, "submit_guest")
+    return timings
+
+
+def _run_session(job):
+    kind, index, value = job
+    try:
+        if kind == "staff":
+            return kind, value, staff_session(index, value), None
+        return kind, value, guest_session(index, value), None
+    except Exception as e:
+        return kind, value, [], str(e)
+
+
+def _init_worker(workdir):
+    # Data files are relative to the working directory, like the real deployment
+    os.chdir(workdir)
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+
+
+# --- Setup / verification ---
+def seed(workdir, n_staff):
+    users = [{"name": f"직원{i:04d}", "car_type": "SUV" if i % 4 == 0 else "SEDAN",
+              "car_number": "", "car_details": "", "last_parked_date": None} for i in range(n_staff)]
+    save_json(os.path.join(workdir, "users.json"), users)
+    capacity_file = os.path.join(APP_DIR, "capacity.json")
+    if os.path.exists(capacity_file):
+        with open(capacity_file, encoding="utf-8") as f:
+            save_json(os.path.join(workdir, "capacity.json"), json.load(f))
+    return [f"{u['name']} ({u['car_type']})" for u in users]
+
+
+def verify(staff_names, guest_names):
+    """Fold everything into requests.json, then compare with what the sessions submitted."""
+    # The sessions' target date (get_target_date in app.py) is the one their events carry
+    target_dates = [e["target_date"] for e in read_events(REQUESTS_LOG_FILE) if e.get("target_date")]
+    target_date = max(set(target_dates), key=target_dates.count) if target_dates else None
+    data = compact("requests.json", REQUESTS_LOG_FILE, target_date)
+    applied = [applicant_name(a) for a in data["applicants"]]
+    guests = [g["name"] for g in data["guests"]]
+    return {
+        "target_date": data["target_date"],
+        "staff_expected": len(staff_names),
+        "staff_found": len(set(applied) & set(staff_names)),
+        "staff_missing": sorted(set(staff_names) - set(applied)),
+        "guest_expected": len(guest_names),
+        "guest_found": len(set(guests) & set(guest_names)),
+        "guest_missing": sorted(set(guest_names) - set(guests)),
+        "duplicates": len(applied) - len(set(applied)) + len(guests) - len(set(guests))
+    }
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+
+    def pick(q):
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+    return {"count": len(values), "p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99),
+            "max": values[-1], "mean": statistics.fmean(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent headless sessions against app.py")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--guests", type=float, default=0.1, help="share of sessions that register a guest")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    n_guests = int(args.sessions * args.guests)
+    n_staff = args.sessions - n_guests
+
+    with tempfile.TemporaryDirectory(prefix="parking-load-") as workdir:
+        user_labels = seed(workdir, n_staff)
+        guest_names = [f"손님{i:04d}" for i in range(n_guests)]
+        jobs = [("staff", i, label) for i, label in enumerate(user_labels)] + \
+               [("guest", i, name) for i, name in enumerate(guest_names)]
+        # Interleave so staff and guest submissions overlap
+        jobs.sort(key=lambda j: j[1])
+
+        # AppTest swaps sys.modules["__main__"] for app.py in the workers, so hand them
+        # functions by their module name rather than as __main__ attributes
+        import loadtest
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.concurrency, initializer=loadtest._init_worker,
+                                 initargs=(workdir,)) as pool:
+            outcomes = list(pool.map(loadtest._run_session, jobs))
+        elapsed = time.perf_counter() - started
+
+        _init_worker(workdir)
+        check = verify([label.rsplit(" (", 1)[0] for label in user_labels], guest_names)
+        os.chdir(APP_DIR)
+
+    steps = {}
+    for _, _, timings, _ in outcomes:
+        for step, seconds in timings:
+            steps.setdefault(step, []).append(seconds)
+    errors = [{"kind": kind, "name": value, "error": error} for kind, value, _, error in outcomes if error]
+    submitted = sum(1 for _, _, timings, error in outcomes if not error)
+
+    results = {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "sessions": args.sessions,
+                 "concurrency": args.concurrency, "guests": n_guests},
+        "elapsed": elapsed,
+        "throughput": submitted / elapsed if elapsed else 0.0,
+        "reruns": percentiles([s for values in steps.values() for s in values]),
+        "steps": {step: percentiles(values) for step, values in steps.items()},
+        "errors": errors,
+        "verify": check
+    }
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    lost = len(check["staff_missing"]) + len(check["guest_missing"])
+    reruns = results["reruns"]
+    print(f"⏱️ {submitted}/{args.sessions} sessions in {elapsed:.1f}s ({results['throughput']:.1f}/s), "
+          f"rerun p50 {reruns.get('p50', 0) * 1000:.0f}ms p99 {reruns.get('p99', 0) * 1000:.0f}ms", file=sys.stderr)
+    if lost or errors or check["duplicates"]:
+        print(f"❌ lost {lost}, duplicates {check['duplicates']}, session errors {len(errors)}", file=sys.stderr)
+        sys.exit(1)
+    print("✅ No applications lost", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Allocation Notifications
+Renders every message for one allocation up front and queues them in the Slack
+outbox in one batch; the outbox worker then delivers them in parallel.
+
+    site:<site id>   full result (slack_message.render_allocation) for the site's channel
+    dm:<member id>   "타워 배정" / "대기 n번" notice for each staff member with a slack_id
+    digest           one-line summary per allocation for an overview channel
+
+Channels resolve to targets at delivery time (make_resolver): site channels use
+their own webhook or fall back to the default one, DMs need a bot token
+(chat.postMessage), the digest needs its own webhook. Messages for channels that
+are not configured are not queued at all.
+"""
+
+from datetime import date
+
+import slack_outbox
+from records import slot_keys
+from slack_message import DAY_NAMES, render_allocation
+
+SLACK_API_URL = "https://slack.com/api/chat.postMessage"
+
+
+def make_resolver(default_url=None, webhooks=None, bot_token=None):
+    """
+    default_url: the SLACK_WEBHOOK_URL webhook
+    webhooks: {channel: webhook URL}, e.g. {"site:plabhouse": ..., "digest": ...}
+    bot_token: Slack bot token for direct messages
+    Returns: resolve(channel) -> webhook URL, chat.postMessage target dict or None
+    """
+    webhooks = webhooks or {}
+
+    def resolve(channel):
+        if channel.startswith("dm:"):
+            if not bot_token:
+                return None
+            return {"url": SLACK_API_URL, "token": bot_token, "channel": channel[3:]}
+        if channel in webhooks:
+            return webhooks[channel]
+        if channel == "digest":
+            return None
+        return default_url
+    return resolve
+
+
+def _day_label(date_str):
+    return f"{date_str} ({DAY_NAMES[date.fromisoformat(date_str).weekday()]})"
+
+
+def render_direct(date_str, zone=None, wait_rank=None):
+    if zone:
+        return f"{zone['icon']} {_day_label(date_str)} 주차: **{zone['name']}** 배정되었습니다."
+    return f"⏳ {_day_label(date_str)} 주차: 대기 {wait_rank}번입니다."
+
+
+def render_digest(entry, capacity, site_name, direct_count):
+    zones = sorted(capacity, key=lambda z: z["display"])
+    usage = " · ".join(f"{z['name']} {len(entry.get(z['id'], []))}/{z['slots']}" for z in zones)
+    return (f"📊 {_day_label(entry['date'])} {site_name} 배정 요약\n"
+            f"• {usage} · 대기 {len(entry.get('wait', []))}명\n"
+            f"• 개별 알림 {direct_count}건")
+
+
+def render_notifications(entry, capacity, user_index, site, direct=True):
+    """All messages for one allocation: [{"key", "channel", "text"}] (direct=False: no DMs)."""
+    date_str = entry["date"]
+    prefix = f"allocation:{site['id']}:{date_str}"
+    zones = {z["id"]: z for z in capacity}
+
+    messages = [{"key": prefix, "channel": f"site:{site['id']}",
+                 "text": render_allocation(entry, capacity, user_index)}]
+
+    notices = []
+    for key in slot_keys(entry) if direct else []:
+        for rank, record in enumerate(entry[key], 1):
+            user = user_index.get(record["name"]) if record.get("kind") != "guest" else None
+            if not user or not user.get("slack_id"):
+                continue
+            if key == "wait":
+                text = render_direct(date_str, wait_rank=rank)
+            else:
+                # Zones removed from capacity.json since the entry was saved keep their id as label
+                text = render_direct(date_str, zone=zones.get(key, {"name": key, "icon": "🅿️"}))
+            notices.append({"key": f"{prefix}:dm:{user['slack_id']}", "channel": f"dm:{user['slack_id']}",
+                           "text": text})
+    messages += notices
+
+    messages.append({"key": f"{prefix}:digest", "channel": "digest",
+                     "text": render_digest(entry, capacity, site.get("name", site["id"]), len(notices))})
+    return messages
+
+
+def fan_out(entry, capacity, user_index, site, resolve, outbox_file=slack_outbox.OUTBOX_FILE):
+    """
+    Queue every configured message for an allocation in one outbox write.
+    Returns: (success, message) like the old send_slack_message.
+    """
+    # DMs are only rendered when a bot token is configured, so the digest counts real notices
+    direct = resolve("dm:") is not None
+    messages = [m for m in render_notifications(entry, capacity, user_index, site, direct)
+                if resolve(m["channel"])]
+    if not messages:
+        return False, "Slack 채널이 설정되지 않았습니다."
+    created = slack_outbox.enqueue_many(messages, outbox_file)
+    return True, f"슬랙 메시지 {created}건을 전송 대기열에 추가했습니다."
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Notifier HTTP Client
+One pooled requests.Session per process for outbound notifications (Slack webhooks),
+shared by the app's outbox worker and auto_allocate.py:
+
+- keep-alive: connections (and TLS sessions) are reused across messages
+- (connect, read) timeouts on every request
+- at most MAX_CONCURRENCY requests in flight; extra callers wait for a slot
+- rate-limit aware: after a 429 the Retry-After is remembered per target (webhook URL,
+  or Web API URL + channel), so callers can hold back the rest of that target's batch
+  instead of hammering it, while other targets keep going (rate_limited_for)
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+MAX_CONCURRENCY = 8
+DEFAULT_RETRY_AFTER = 1  # seconds, when a 429 comes without Retry-After
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class NotifierClient:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Pool as large as the concurrency cap, so every in-flight request keeps its connection
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # limit key -> time.monotonic() when requests may resume. Per target, like Slack's
+        # limits (per webhook, per channel for chat.postMessage)
+        self._blocked_until = {}
+
+    def rate_limited_for(self, limit_key):
+        """Seconds left on the last 429 for limit_key (0 if none)."""
+        remaining = self._blocked_until.get(limit_key, 0) - time.monotonic()
+        return max(0.0, remaining)
+
+    def post_json(self, url, payload, headers=None, limit_key=None):
+        """
+        POST payload as JSON; raises requests.RequestException on network errors.
+        A 429 blocks limit_key (default: url) for its Retry-After.
+        """
+        with self._slots:
+            response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+            except ValueError:
+                retry_after = DEFAULT_RETRY_AFTER
+            self._blocked_until[limit_key or url] = time.monotonic() + retry_after
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+def get_client():
+    # Shared per process (threads included), created on first use
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = NotifierClient()
+        return _client
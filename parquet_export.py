@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar Export
+Writes the allocation history and each day's applications as Parquet (or Arrow IPC)
+datasets, partitioned by month (hive layout, readable with pandas.read_parquet(dir)):
+
+    export/history/month=2025-11/data.parquet        date, zone, person, car_type, kind, source, applied_at
+    export/applications/month=2025-11/data.parquet   date, kind, name, car_type, location, applied_at, ...
+    export/_manifest.json                            months written, with the history "rev" they reflect
+
+Incremental: only months whose history changed since the last export (new or edited
+days, see PartitionedHistory.version) are rewritten - normally just the current one.
+Applications come from the requests_backup_{date}.json files written at rollover.
+
+    python parquet_export.py [export_dir] [--format parquet|arrow] [--full]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from history_store import PartitionedHistory
+from records import slot_keys
+from storage import load_json
+
+EXPORT_DIR = "export"
+MANIFEST_FILE = "_manifest.json"
+FORMATS = {"parquet": "data.parquet", "arrow": "data.arrow"}
+
+HISTORY_SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("zone", pa.string()),
+    ("person", pa.string()),
+    ("car_type", pa.string()),
+    ("kind", pa.string()),
+    ("source", pa.string()),
+    ("applied_at", pa.string())
+])
+
+APPLICATIONS_SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("kind", pa.string()),
+    ("name", pa.string()),
+    ("car_type", pa.string()),
+    ("location", pa.string()),
+    ("applied_at", pa.string()),
+    ("reason", pa.string()),
+    ("researcher", pa.string()),
+    ("sante_opt_out", pa.bool_())
+])
+
+
+def _backup_path(date_str, requests_dir=""):
+    # Same naming as request_log.compact()
+    return os.path.join(requests_dir, f"requests_backup_{date_str}.json")
+
+
+def history_rows(entries):
+    return [
+        {"date": h["date"], "zone": key, "person": r["name"], "car_type": r.get("car_type"),
+         "kind": r.get("kind"), "source": r.get("source"), "applied_at": r.get("applied_at")}
+        for h in entries
+        for key in slot_keys(h)
+        for r in h[key]
+    ]
+
+
+def application_rows(date_str, requests_data, user_index):
+    rows = []
+    sante = bool(requests_data.get("sante_opt_out"))
+    for app in requests_data.get("applicants", []):
+        name = app["name"] if isinstance(app, dict) else app
+        user = user_index.get(name, {})
+        rows.append({"date": date_str, "kind": "staff", "name": name, "car_type": user.get("car_type"),
+                     "location": None, "applied_at": app.get("timestamp") if isinstance(app, dict) else None,
+                     "reason": None, "researcher": None, "sante_opt_out": sante})
+    for g in requests_data.get("guests", []):
+        rows.append({"date": date_str, "kind": "guest", "name": g.get("name"), "car_type": g.get("car_type"),
+                     "location": g.get("location"), "applied_at": g.get("timestamp"),
+                     "reason": g.get("reason"), "researcher": g.get("researcher"), "sante_opt_out": sante})
+    return rows
+
+
+def _replace_atomically(path, write):
+    # Unique temp file in the target directory + rename (as storage.py does), so readers
+    # never see a half-written file and concurrent exports do not share a temp name
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write(table, path, fmt):
+    if fmt == "arrow":
+        _replace_atomically(path, lambda tmp: feather.write_feather(table, tmp, compression="zstd"))
+    else:
+        _replace_atomically(path, lambda tmp: pq.write_table(table, tmp, compression="zstd"))
+
+
+def _load_manifest(path, fmt):
+    # Plain file next to the data files: part of the export, not a storage document
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"format": fmt, "months": {}}
+
+
+def _save_manifest(path, manifest):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+
+    _replace_atomically(path, write)
+
+
+def _table(rows, schema):
+    for row in rows:
+        # date32 wants datetime.date; ISO strings are converted here
+        row["date"] = date.fromisoformat(row["date"])
+    return pa.Table.from_pylist(rows, schema=schema)
+
+
+def export(history, user_index, export_dir=EXPORT_DIR, fmt="parquet", full=False, requests_dir=""):
+    """
+    Write changed months (and drop months no longer in history).
+    full=True rewrites every month. Returns the list of months touched.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    manifest_path = os.path.join(export_dir, MANIFEST_FILE)
+    manifest = _load_manifest(manifest_path, fmt)
+    if manifest.get("format") != fmt:
+        full = True
+    exported = {} if full else manifest["months"]
+    if full:
+        for dataset in ("history", "applications"):
+            shutil.rmtree(os.path.join(export_dir, dataset), ignore_errors=True)
+
+    written = []
+    current = {month for month, _, _ in history.version}
+    for month in [m for m in exported if m not in current]:
+        # Month deleted from history since the last export
+        for dataset in ("history", "applications"):
+            shutil.rmtree(os.path.join(export_dir, dataset, f"month={month}"), ignore_errors=True)
+        del exported[month]
+        written.append(month)
+
+    for month, count, rev in history.version:
+        if exported.get(month) == rev:
+            continue
+        entries = history.month(month)
+        _write(_table(history_rows(entries), HISTORY_SCHEMA),
+               os.path.join(export_dir, "history", f"month={month}", FORMATS[fmt]), fmt)
+
+        app_rows = []
+        for h in entries:
+            backup = load_json(_backup_path(h["date"], requests_dir), None)
+            if backup:
+                app_rows.extend(application_rows(h["date"], backup, user_index))
+        _write(_table(app_rows, APPLICATIONS_SCHEMA),
+               os.path.join(export_dir, "applications", f"month={month}", FORMATS[fmt]), fmt)
+
+        exported[month] = rev
+        written.append(month)
+
+    if written or full:
+        _save_manifest(manifest_path, {"format": fmt, "months": exported})
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export history and applications as monthly Parquet / Arrow files")
+    parser.add_argument("export_dir", nargs="?", default=EXPORT_DIR)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--full", action="store_true", help="rewrite every month")
+    args = parser.parse_args()
+
+    users = load_json("users.json", [])
+    user_index = {u["name"]: u for u in users}
+    archive = PartitionedHistory(user_index=user_index)
+    months = export(archive, user_index, args.export_dir, fmt=args.format, full=args.full)
+    if months:
+        print(f"✅ Exported {len(months)} month(s) to {args.export_dir}/ ({args.format}): {', '.join(months)}")
+    else:
+        print(f"✅ {args.export_dir}/ is up to date")
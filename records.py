@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Allocation Records
+History slots are stored as structured records instead of display strings:
+    {"name": "시안", "car_type": "SEDAN", "kind": "staff",
+     "applied_at": "2025-12-03T07:42:10", "source": "auto"}
+
+Entries hold one list per zone id (see capacity.py) plus "wait".
+
+kind:   "staff" | "guest"
+source: "auto" (allocation run) | "manual" (admin entry/edit)
+Display strings ("시안 (SEDAN) 07:42", "... 수동입력") are only rendered at the edge.
+"""
+
+from datetime import datetime
+
+
+def slot_keys(entry):
+    # Zone ids + "wait": every list-valued key of a history entry
+    return [key for key, value in entry.items() if isinstance(value, list)]
+
+
+def make_record(name, car_type, kind="staff", applied_at=None, source="auto"):
+    return {
+        "name": name,
+        "car_type": car_type,
+        "kind": kind,
+        "applied_at": applied_at,
+        "source": source
+    }
+
+
+def parse_legacy(item, user_index=None):
+    """
+    Convert an old display string into a record.
+    Formats: "Name", "Name (CAR)", "Name (CAR) HH:MM", "Name (CAR) 수동입력"
+    """
+    if isinstance(item, dict):
+        return item
+
+    applied_at = None
+    source = "manual"  # bare names / 수동입력 came from manual entry
+    parts = item.rsplit(' ', 1)
+    if len(parts) == 2 and ':' in parts[1]:
+        item, applied_at, source = parts[0], parts[1], "auto"
+    elif len(parts) == 2 and parts[1] == '수동입력':
+        item = parts[0]
+
+    car_type = None
+    if item.endswith(")") and " (" in item:
+        item, car_type = item[:-1].split(" (", 1)
+
+    user = user_index.get(item) if user_index else None
+    if car_type is None and user:
+        car_type = user["car_type"]
+    # Anyone not in the staff list was a guest
+    kind = "staff" if user or user_index is None else "guest"
+    return make_record(item, car_type, kind, applied_at, source)
+
+
+def migrate_entry(entry, user_index=None):
+    """Convert string slots of one history entry in place. Returns True if anything changed."""
+    changed = False
+    for key in slot_keys(entry):
+        slots = entry[key]
+        if any(isinstance(item, str) for item in slots):
+            entry[key] = [parse_legacy(item, user_index) for item in slots]
+            changed = True
+    return changed
+
+
+def _time_label(applied_at):
+    # applied_at is an ISO timestamp, or "HH:MM" for migrated entries
+    if "T" in applied_at:
+        return datetime.fromisoformat(applied_at).strftime("%H:%M")
+    return applied_at
+
+
+def option_label(record, user_index=None):
+    # "Name (CAR)" - matches the staff multiselect options
+    car_type = record.get("car_type")
+    if car_type is None and user_index and record["name"] in user_index:
+        car_type = user_index[record["name"]]["car_type"]
+    return f"{record['name']} ({car_type})" if car_type else record["name"]
+
+
+def display_name(record, with_time=True, user_index=None):
+    """
+    Render a record for the UI / Slack.
+    with_time=True appends the application time, or 수동입력 for manual entries.
+    """
+    label = option_label(record, user_index)
+    if not with_time:
+        return label
+    if record.get("source") == "manual":
+        return f"{label} 수동입력"
+    if record.get("applied_at"):
+        return f"{label} {_time_label(record['applied_at'])}"
+    return label
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only Request Log
+Each application / guest registration / change is appended to requests_log.jsonl
+as one JSON line (O_APPEND, no rewrite of requests.json). The current requests
+view is requests.json (last compacted snapshot) + the log folded on top.
+The log is compacted into the snapshot at target_date rollover; the fresh log
+starts with a {"generation": <id>} line so readers can tell it from the old one.
+"""
+
+import copy
+import json
+import os
+import uuid
+
+from storage import file_lock, load_json, save_json
+
+REQUESTS_LOG_FILE = "requests_log.jsonl"
+
+# abspath -> (generation, bytes parsed, events)
+_events_cache = {}
+
+
+def empty_requests(target_date):
+    return {
+        "target_date": str(target_date),
+        "applicants": [],
+        "guests": [],
+        "sante_opt_out": False
+    }
+
+
+def applicant_name(app):
+    # Old format stored applicants as plain name strings
+    return app["name"] if isinstance(app, dict) else app
+
+
+def append_event(log_path, event):
+    """
+    Append one event as a single line.
+    Appenders share the lock, so they never wait on each other - only on compaction.
+    """
+    line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+    with file_lock(log_path, shared=True):
+        fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _parse_lines(chunk):
+    events = []
+    for line in chunk.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            # Torn line from a crash mid-append - skip it
+            continue
+        if "op" in event:  # the generation header is not an event
+            events.append(event)
+    return events
+
+
+def _read_generation(f):
+    # Generation id from the header line (None for a log created by the first append)
+    try:
+        header = json.loads(f.readline())
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return header.get("generation") if isinstance(header, dict) else None
+
+
+def read_events(log_path):
+    """
+    Parsed log events. The log only grows between compactions, so each process
+    keeps what it already parsed and only reads the bytes appended since.
+    A different generation header means the log was compacted and recreated
+    (inode numbers get reused, so they cannot tell): start over.
+    """
+    key = os.path.abspath(log_path)
+    try:
+        f = open(log_path, "rb")
+    except FileNotFoundError:
+        _events_cache.pop(key, None)
+        return []
+
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        generation = _read_generation(f)
+        cached_generation, offset, events = _events_cache.get(key, (None, 0, []))
+        if cached_generation != generation or size < offset:
+            offset, events = 0, []
+
+        if size > offset:
+            f.seek(offset)
+            chunk = f.read(size - offset)
+            # Leave an unfinished trailing line for the next read
+            complete = chunk.rfind(b"\n") + 1
+            events = events + _parse_lines(chunk[:complete].decode("utf-8"))
+            offset += complete
+
+    _events_cache[key] = (generation, offset, events)
+    return list(events)
+
+
+def _normalize(data):
+    # Migration: Handle old 'guest' dict format if exists
+    if "guest" in data:
+        if isinstance(data["guest"], dict) and data["guest"].get("needed"):
+            old = data["guest"]
+            data["guests"] = [{
+                "name": "기존 손님",
+                "car_type": old.get("car_type", "SEDAN"),
+                "location": old.get("location", "상관없음(ANY)"),
+                "reason": "데이터 마이그레이션",
+                "researcher": "시스템"
+            }]
+        del data["guest"]
+
+    # Ensure 'guests' key exists
+    if "guests" not in data:
+        data["guests"] = []
+    return data
+
+
+def apply_event(data, event):
+    op = event["op"]
+    if op == "apply":
+        # First application wins; duplicates from racing sessions are dropped here
+        if not any(applicant_name(a) == event["name"] for a in data["applicants"]):
+            data["applicants"].append({"name": event["name"], "timestamp": event["timestamp"]})
+    elif op == "cancel":
+        data["applicants"] = [a for a in data["applicants"] if applicant_name(a) != event["name"]]
+    elif op == "guest":
+        data["guests"].append(dict(event["guest"]))
+    elif op == "remove_guest":
+        if event["guest"] in data["guests"]:
+            data["guests"].remove(event["guest"])
+    elif op == "sante":
+        data["sante_opt_out"] = event["value"]
+    elif op == "rename":
+        for app in data["applicants"]:
+            if isinstance(app, dict) and app["name"] == event["old"]:
+                app["name"] = event["new"]
+
+
+def fold(snapshot, events, target_date):
+    """
+    Build the requests view for target_date.
+    Events recorded for other dates are ignored.
+    """
+    target_date = str(target_date)
+    if snapshot and snapshot.get("target_date") == target_date:
+        data = _normalize(copy.deepcopy(snapshot))
+    else:
+        data = empty_requests(target_date)
+
+    for event in events:
+        if event.get("target_date") == target_date:
+            apply_event(data, event)
+    return data
+
+
+def load_requests(snapshot_path, log_path, default_target_date):
+    """
+    Current requests view: snapshot + log, for the snapshot's own target_date
+    (callers check it against today's target and call compact() on rollover).
+    """
+    snapshot = load_json(snapshot_path, None)
+    if snapshot and snapshot.get("target_date"):
+        target_date = snapshot["target_date"]
+    else:
+        target_date = default_target_date
+    return fold(snapshot, read_events(log_path), target_date)
+
+
+def load_day(snapshot_path, log_path, date_str):
+    """
+    Requests view for one given date: the live view while it is still that date's,
+    the requests_backup_{date}.json written by compact() once it has rolled over.
+    """
+    date_str = str(date_str)
+    data = load_requests(snapshot_path, log_path, date_str)
+    if data["target_date"] == date_str:
+        return data
+    backup = load_json(_backup_path(snapshot_path, date_str), None)
+    if backup:
+        return _normalize(backup)
+    # Snapshot still on an older date: only the log can hold this date's events
+    return fold(None, read_events(log_path), date_str)
+
+
+def _new_log(log_path):
+    # Swap in an empty log with a fresh generation header (caller holds the exclusive lock),
+    # which tells other processes' read_events caches to start over
+    directory = os.path.dirname(os.path.abspath(log_path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(log_path)}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write((json.dumps({"generation": uuid.uuid4().hex}) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, log_path)
+    _events_cache.pop(os.path.abspath(log_path), None)
+
+
+def _backup_path(snapshot_path, date_str):
+    directory = os.path.dirname(snapshot_path)
+    return os.path.join(directory, f"requests_backup_{date_str}.json")
+
+
+def compact(snapshot_path, log_path, target_date):
+    """
+    Fold the log into the snapshot for target_date and start a new log.
+    On rollover the previous day's view is written to requests_backup_{date}.json.
+    Returns the new requests view.
+    """
+    target_date = str(target_date)
+    with file_lock(log_path):
+        snapshot = load_json(snapshot_path, None)
+        # Re-read the whole log under the lock instead of trusting this process's cache
+        _events_cache.pop(os.path.abspath(log_path), None)
+        events = read_events(log_path)
+
+        old_date = snapshot.get("target_date") if snapshot else None
+        if old_date and old_date != target_date:
+            # BACKUP LOGIC: Save previous data before reset
+            old_data = fold(snapshot, events, old_date)
+            if old_data["applicants"] or old_data["guests"]:
+                save_json(_backup_path(snapshot_path, old_date), old_data)
+
+        data = fold(snapshot, events, target_date)
+        save_json(snapshot_path, data)
+        _new_log(log_path)
+    return data
+
+
+def reset_requests(snapshot_path, log_path, target_date):
+    # Wipe the snapshot and the log together (admin reset)
+    with file_lock(log_path):
+        data = empty_requests(target_date)
+        save_json(snapshot_path, data)
+        _new_log(log_path)
+    return data
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Allocation Run Ledger
+One record per (site, date) in runs.json, claimed with a locked read-modify-write
+before any allocation work starts:
+
+    "plabhouse|2025-11-03": {"run_id", "site", "date", "status", "input_hash",
+                             "output_hash", "attempts", "started_at", "finished_at", "message",
+                             "notify"}
+
+status: "running" -> "done" | "empty" | "failed".
+notify: None (no notification wanted) | "pending" -> "queued" | "skipped". A done run is
+stored with "pending" before its notification is queued, so a crash in between leaves
+a run that the next caller notifies again (the outbox deduplicates by key).
+A date that is done, running in another process, or empty with unchanged input cannot
+be claimed again, so retried GitHub Actions runs, page loads and the admin button
+become no-ops. Failed runs, runs stuck in "running" longer than STALE_SECONDS and
+released dates (history entry deleted) can be claimed again.
+"""
+
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from storage import load_json, update_json
+
+LEDGER_FILE = "runs.json"
+STALE_SECONDS = 600
+
+
+def run_key(site, date_str):
+    return f"{site}|{date_str}"
+
+
+def content_hash(data):
+    # Stable digest of JSON-able data (sorted keys, so dict order does not matter)
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def get_run(site, date_str, ledger_file=LEDGER_FILE):
+    return load_json(ledger_file, {}).get(run_key(site, date_str))
+
+
+def _claimable(run, now, input_hash):
+    if run is None or run["status"] == "failed":
+        return True
+    if run["status"] == "empty":
+        # Nothing to allocate last time: run again once applications came in
+        return run["input_hash"] != input_hash
+    if run["status"] == "running":
+        started = datetime.fromisoformat(run["started_at"])
+        return now - started > timedelta(seconds=STALE_SECONDS)
+    return False
+
+
+def claim(site, date_str, input_hash, ledger_file=LEDGER_FILE):
+    """
+    Atomically start a run for (site, date).
+    Returns: (claimed, run) - claimed is False when another run already owns the date,
+    run is then that existing record.
+    """
+    key = run_key(site, date_str)
+    now = datetime.now()
+
+    def mutate(ledger):
+        run = ledger.get(key)
+        if not _claimable(run, now, input_hash):
+            return False
+        ledger[key] = {
+            "run_id": uuid.uuid4().hex,
+            "site": site,
+            "date": str(date_str),
+            "status": "running",
+            "input_hash": input_hash,
+            "output_hash": None,
+            "attempts": (run or {}).get("attempts", 0) + 1,
+            "started_at": now.isoformat(timespec="seconds"),
+            "finished_at": None,
+            "message": "",
+            "notify": None
+        }
+
+    ledger, result = update_json(ledger_file, {}, mutate)
+    return result is not False, ledger[key]
+
+
+def finish(run, status, output_hash=None, message="", notify=None, ledger_file=LEDGER_FILE):
+    """Record the outcome of a claimed run (ignored if the date was re-claimed since)."""
+    key = run_key(run["site"], run["date"])
+
+    def mutate(ledger):
+        current = ledger.get(key)
+        if not current or current["run_id"] != run["run_id"]:
+            return False
+        current.update({
+            "status": status,
+            "output_hash": output_hash,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "message": message,
+            "notify": notify
+        })
+
+    ledger, _ = update_json(ledger_file, {}, mutate)
+    return ledger.get(key)
+
+
+def set_notify(run, notify, ledger_file=LEDGER_FILE):
+    """Record the notification outcome of a done run: "queued" | "skipped"."""
+    key = run_key(run["site"], run["date"])
+
+    def mutate(ledger):
+        current = ledger.get(key)
+        if not current or current["run_id"] != run["run_id"]:
+            return False
+        current["notify"] = notify
+
+    update_json(ledger_file, {}, mutate)
+
+
+def release(site, date_str, ledger_file=LEDGER_FILE):
+    """Forget the run for (site, date), e.g. after its history entry was deleted."""
+    key = run_key(site, date_str)
+
+    def mutate(ledger):
+        if key not in ledger:
+            return False
+        del ledger[key]
+
+    update_json(ledger_file, {}, mutate)
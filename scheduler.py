@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Auto-Allocation Scheduler
+The 08:01 allocation as a job of its own, instead of a side effect of whoever loads
+the page first:
+
+- run_allocation(date) allocates one day after claiming (site, date) in the run
+  ledger (run_ledger.py), so racing callers (threads, app processes, auto_allocate.py
+  on the same data) allocate a date at most once and duplicates are cheap no-ops.
+  The run is marked done with its notification still "pending" and only then
+  notified, so a notification lost to a crash or an error is sent by the next call.
+- AllocationScheduler is a daemon thread started once per app process; it polls the
+  clock and calls run_allocation inside the 08:01-09:00 window. Pages only read the
+  result from history (and last_run for status).
+"""
+
+import threading
+from datetime import datetime, time as dtime
+
+import pytz
+
+from allocation import allocate, get_capacity, index_users, mark_parked
+from capacity import get_site, get_solver, load_capacity_config
+from fairness import FairnessIndex
+from history_store import PartitionedHistory, month_of
+from request_log import REQUESTS_LOG_FILE, load_day
+from run_ledger import claim, content_hash, finish, set_notify
+from stats import UserStats
+from storage import load_json, save_json
+
+USERS_FILE = "users.json"
+REQUESTS_FILE = "requests.json"
+
+# Allocation window (KST): the scheduler only fires between these times
+WINDOW_START = dtime(8, 1)
+WINDOW_END = dtime(9, 0)
+POLL_SECONDS = 20
+
+
+def get_kst_time():
+    return datetime.now(pytz.timezone('Asia/Seoul'))
+
+
+def in_window(now):
+    return WINDOW_START <= now.time() < WINDOW_END
+
+
+def run_allocation(date_str, notify=None, log=print):
+    """
+    Allocate date_str from that day's requests, save users + history, then hand the
+    result to notify(entry, capacity, user_index, site) -> (success, msg) if given
+    (notifications.fan_out).
+    The run is claimed in the ledger first (run_ledger.py); if another run owns the
+    date this returns right away without touching users / history, only retrying the
+    notification of a done run whose notify is still "pending".
+    Returns: (status, history_entry or None, message), status one of
+    "allocated", "notified" (pending notification retried), "exists", "empty".
+    """
+    date_str = str(date_str)
+    capacity_config = load_capacity_config()
+    site = get_site(capacity_config)
+    requests_data = load_day(REQUESTS_FILE, REQUESTS_LOG_FILE, date_str)
+    capacity = get_capacity(capacity_config, date_str, requests_data.get("sante_opt_out"))
+
+    claimed, run = claim(site["id"], date_str, content_hash({"requests": requests_data, "capacity": capacity}))
+    if not claimed:
+        if notify and run["status"] == "done" and run.get("notify") == "pending":
+            # Allocated, but the notification never got queued
+            user_index = index_users(load_json(USERS_FILE, []))
+            history = PartitionedHistory(eager_months=[month_of(date_str)], user_index=user_index)
+            history_entry = history.get(date_str)
+            if history_entry:
+                message = _notify(run, notify, history_entry, capacity, user_index, site, log)
+                return "notified", history_entry, message
+        status = "empty" if run["status"] == "empty" else "exists"
+        return status, None, f"{date_str} already {run['status']} (run {run['run_id'][:8]})"
+
+    try:
+        users = load_json(USERS_FILE, [])
+        user_index = index_users(users)
+        # Month-partitioned history: only the target month is read
+        history = PartitionedHistory(eager_months=[month_of(date_str)], user_index=user_index)
+        if date_str in history:
+            # Allocated before the ledger existed (or entered by hand)
+            finish(run, "done", content_hash(history.get(date_str)), "already in history")
+            return "exists", history.get(date_str), f"Allocation for {date_str} already exists"
+
+        if not requests_data.get("applicants") and not requests_data.get("guests"):
+            finish(run, "empty", message="no applicants")
+            return "empty", None, f"No applicants for {date_str}"
+        log(f"👥 {len(requests_data.get('applicants', []))} staff / "
+            f"{len(requests_data.get('guests', []))} guest applicants for {date_str}")
+
+        fairness = FairnessIndex(history=history)
+        history.subscribe(fairness)
+        history.subscribe(UserStats(history=history))
+
+        history_entry, parked = allocate(requests_data, users, capacity, date_str, user_index,
+                                         solver=get_solver(capacity_config), fairness=fairness.scores())
+
+        # Update last_parked_date for allocated staff
+        mark_parked(users, parked, date_str, user_index)
+        save_json(USERS_FILE, users, backup=True)
+
+        history.upsert(history_entry)
+        history.save()
+    except Exception as e:
+        finish(run, "failed", message=str(e))
+        raise
+    finish(run, "done", content_hash(history_entry), notify="pending" if notify else None)
+
+    message = "Allocation saved"
+    if notify:
+        message = _notify(run, notify, history_entry, capacity, user_index, site, log)
+    return "allocated", history_entry, message
+
+
+def _notify(run, notify, history_entry, capacity, user_index, site, log):
+    # Raises if notify fails: the run stays "pending" and the next call retries.
+    # Messages are keyed per site / date, so a retry never posts twice
+    success, message = notify(history_entry, capacity, user_index, site)
+    set_notify(run, "queued" if success else "skipped")
+    log(f"{'✅' if success else '❌'} {message}")
+    return message
+
+
+class AllocationScheduler(threading.Thread):
+    """Polls the KST clock and runs the allocation once per day inside the window."""
+
+    def __init__(self, notify=None, poll_seconds=POLL_SECONDS):
+        super().__init__(name="auto-allocation", daemon=True)
+        self.notify = notify
+        self.poll_seconds = poll_seconds
+        self.last_run = None  # {"date", "status", "message", "at"}
+        self._done_date = None
+        self._stop_event = threading.Event()
+
+    def tick(self, now=None):
+        # One scheduling decision; returns the run status or None when nothing was due
+        now = now or get_kst_time()
+        date_str = str(now.date())
+        if self._done_date == date_str or not in_window(now):
+            return None
+        try:
+            status, _, message = run_allocation(date_str, notify=self.notify)
+        except Exception as e:
+            # Retried on the next poll; a date only counts as done once its history entry exists
+            status, message = "error", str(e)
+        else:
+            self._done_date = date_str
+        self.last_run = {"date": date_str, "status": status, "message": message,
+                         "at": now.isoformat(timespec="seconds")}
+        print(f"🤖 Auto-allocation {date_str}: {status} ({message})")
+        return status
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.tick()
+            self._stop_event.wait(self.poll_seconds)
+
+    def stop(self):
+        self._stop_event.set()
+
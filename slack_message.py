@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Slack Message Rendering
+One renderer for the allocation result message, shared by the 08:01 auto
+allocation, the admin "슬랙으로 결과 전송" button and auto_allocate.py.
+"""
+
+from datetime import date
+
+from records import display_name
+
+DAY_NAMES = ["월", "화", "수", "목", "금", "토", "일"]
+
+
+def render_allocation(entry, capacity, user_index=None):
+    """
+    entry: history entry ({"date", <zone id>: [records], "wait": [records]})
+    capacity: resolved zone list (allocation.get_capacity) the entry was allocated with
+    """
+    date_str = entry["date"]
+    weekday = DAY_NAMES[date.fromisoformat(date_str).weekday()]
+    zones = sorted(capacity, key=lambda z: z["display"])
+
+    total_capacity = sum(z["slots"] for z in zones)
+    total_occupied = sum(len(entry.get(z["id"], [])) for z in zones)
+
+    lines = [
+        f"📅 **{date_str} ({weekday}) 주차 배정 결과**",
+        "",
+        "🅿️ **주차 공간 현황**",
+        f"• 전체: {total_occupied}/{total_capacity} (남은 공간: {total_capacity - total_occupied})"
+    ]
+    for z in zones:
+        occupied = len(entry.get(z["id"], []))
+        lines.append(f"• {z['name']}: {occupied}/{z['slots']} (남은 공간: {z['slots'] - occupied})")
+
+    for z in zones:
+        lines += ["", f"{z['icon']} **{z['name']} 배정**"]
+        records = entry.get(z["id"], [])
+        if records:
+            lines += [f"• {display_name(r, with_time=False, user_index=user_index)}" for r in records]
+        else:
+            lines.append("• (배정 없음)")
+
+    if entry.get("wait"):
+        lines += ["", "⏳ **대기 인원** (우선순위에서 밀림)"]
+        lines += [f"• {display_name(r, with_time=False, user_index=user_index)}" for r in entry["wait"]]
+
+    return "\n".join(lines)
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Slack Outbox
+Messages are written to slack_outbox.json first and posted by a background worker,
+so a slow or failing Slack never blocks a page and nothing is lost on failure:
+
+    {"key", "channel", "text", "status", "attempts", "created_at", "next_attempt_at",
+     "sent_at", "last_error"}
+
+status: "pending" -> "sending" (leased by one worker) -> "sent" | "failed".
+Retriable errors (timeouts, 5xx, 429) are retried with exponential backoff
+(429 waits for Retry-After); after MAX_ATTEMPTS, or on other 4xx, it is "failed".
+Messages held back because their target is still rate limited were never posted:
+they are rescheduled without counting an attempt.
+The key deduplicates: enqueuing a key that is already in the outbox is a no-op.
+
+    python slack_outbox.py status
+    python slack_outbox.py flush                  # deliver now (SLACK_WEBHOOK_URL)
+    python slack_outbox.py stub --port 8765 --fail 2
+        local webhook stub: logs posts, answers the first N with 500 (or --code)
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+from notifier import MAX_CONCURRENCY, get_client
+from storage import load_json, update_json
+
+OUTBOX_FILE = "slack_outbox.json"
+MAX_ATTEMPTS = 8
+BASE_DELAY = 15       # seconds before the first retry, doubled per attempt
+MAX_DELAY = 1800
+LEASE_SECONDS = 300   # a "sending" message is re-queued if its worker died
+BATCH_SIZE = 100      # messages leased per delivery round
+KEEP_FINISHED = 200   # sent / failed messages kept for the admin tab
+POLL_SECONDS = 5
+RATE_LIMITED = "rate limited"  # post_slack error for a message held back locally (not posted)
+
+# Set by enqueue() so the worker picks new messages up without waiting for the poll
+_wake = threading.Event()
+
+
+def _now():
+    return datetime.now()
+
+
+def _iso(dt):
+    return dt.isoformat(timespec="seconds")
+
+
+def backoff(attempts):
+    delay = min(MAX_DELAY, BASE_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+# --- Queue ---
+def _new_message(key, channel, text, now):
+    return {"key": key, "channel": channel, "text": text, "status": "pending", "attempts": 0,
+            "created_at": now, "next_attempt_at": now, "sent_at": None, "last_error": ""}
+
+
+def enqueue(text, key=None, channel="default", outbox_file=OUTBOX_FILE):
+    """
+    Persist a message for delivery.
+    Returns: (created, message) - created is False when the key was already queued.
+    """
+    key = key or uuid.uuid4().hex
+    now = _iso(_now())
+
+    def mutate(outbox):
+        if any(m["key"] == key for m in outbox):
+            return False
+        outbox.append(_new_message(key, channel, text, now))
+
+    outbox, result = update_json(outbox_file, [], mutate)
+    _wake.set()
+    return result is not False, next(m for m in outbox if m["key"] == key)
+
+
+def enqueue_many(items, outbox_file=OUTBOX_FILE):
+    """
+    Persist a batch of {"key", "channel", "text"} in one write (keys already queued are skipped).
+    Returns: number of messages added.
+    """
+    now = _iso(_now())
+
+    def mutate(outbox):
+        known = {m["key"] for m in outbox}
+        added = 0
+        for item in items:
+            if item["key"] not in known:
+                outbox.append(_new_message(item["key"], item["channel"], item["text"], now))
+                known.add(item["key"])
+                added += 1
+        return added or False
+
+    _, added = update_json(outbox_file, [], mutate)
+    _wake.set()
+    return added or 0
+
+
+def messages(outbox_file=OUTBOX_FILE):
+    return load_json(outbox_file, [])
+
+
+def retry_failed(outbox_file=OUTBOX_FILE):
+    """Put failed messages back in the queue (admin button). Returns how many."""
+    now = _iso(_now())
+
+    def mutate(outbox):
+        count = 0
+        for m in outbox:
+            if m["status"] == "failed":
+                m.update({"status": "pending", "attempts": 0, "next_attempt_at": now})
+                count += 1
+        return count or False
+
+    _, count = update_json(outbox_file, [], mutate)
+    _wake.set()
+    return count or 0
+
+
+def _lease_due(outbox_file, now):
+    # Atomically mark due messages "sending", so two workers never post the same one
+    lease_until = _iso(now + timedelta(seconds=LEASE_SECONDS))
+    now_iso = _iso(now)
+
+    def mutate(outbox):
+        leased = []
+        for m in outbox:
+            expired_lease = m["status"] == "sending" and m["next_attempt_at"] <= now_iso
+            if len(leased) >= BATCH_SIZE:
+                break
+            if (m["status"] == "pending" and m["next_attempt_at"] <= now_iso) or expired_lease:
+                m["status"] = "sending"
+                m["next_attempt_at"] = lease_until
+                leased.append(dict(m))
+        return leased or False
+
+    _, leased = update_json(outbox_file, [], mutate)
+    return leased or []
+
+
+def _record(outbox_file, results):
+    # One write for a whole delivery batch: results are (key, ok, error, retriable, retry_after)
+    now = _now()
+    by_key = {r[0]: r[1:] for r in results}
+
+    def mutate(outbox):
+        for m in outbox:
+            if m["key"] not in by_key:
+                continue
+            ok, error, retriable, retry_after = by_key[m["key"]]
+            if error == RATE_LIMITED:
+                # Never left this process: wait out Retry-After, attempts unchanged
+                m.update({"status": "pending",
+                          "next_attempt_at": _iso(now + timedelta(seconds=retry_after + 1))})
+                continue
+            m["attempts"] += 1
+            if ok:
+                m.update({"status": "sent", "sent_at": _iso(now), "last_error": ""})
+            elif not retriable or m["attempts"] >= MAX_ATTEMPTS:
+                m.update({"status": "failed", "last_error": error})
+            else:
+                delay = retry_after if retry_after is not None else backoff(m["attempts"])
+                # +1s: timestamps are stored to the second, never retry before Retry-After
+                m.update({"status": "pending", "last_error": error,
+                          "next_attempt_at": _iso(now + timedelta(seconds=delay + 1))})
+        # Keep the file small: drop the oldest finished messages
+        finished = [m for m in outbox if m["status"] in ("sent", "failed")]
+        for m in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            outbox.remove(m)
+
+    update_json(outbox_file, [], mutate)
+
+
+# --- Delivery ---
+def post_slack(target, text):
+    """
+    POST one message: target is an incoming-webhook URL, or a chat.postMessage target
+    {"url", "token", "channel"} (direct messages).
+    Returns: (ok, error, retriable, retry_after seconds or None)
+    """
+    client = get_client()
+    url = target["url"] if isinstance(target, dict) else target
+    # Rate limits are per webhook, and per channel for chat.postMessage
+    limit_key = f"{url}#{target['channel']}" if isinstance(target, dict) else url
+    waiting = client.rate_limited_for(limit_key)
+    if waiting:
+        # This target answered 429 recently: do not spend a request, come back after Retry-After
+        return False, RATE_LIMITED, True, waiting
+
+    payload, headers = {"text": text}, None
+    if isinstance(target, dict):
+        payload["channel"] = target["channel"]
+        headers = {"Authorization": f"Bearer {target['token']}"}
+    try:
+        response = client.post_json(url, payload, headers=headers, limit_key=limit_key)
+    except requests.RequestException as e:
+        return False, str(e), True, None
+
+    if response.status_code == 429:
+        return False, f"HTTP 429: {response.text[:200]}", True, client.rate_limited_for(limit_key)
+    if response.status_code != 200:
+        return False, f"HTTP {response.status_code}: {response.text[:200]}", response.status_code >= 500, None
+    if isinstance(target, dict):
+        # Web API answers 200 with {"ok": false, "error": ...} for bad channels / tokens
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"error": f"unexpected response {response.text[:50]!r}"}
+        if not body.get("ok"):
+            return False, f"Slack API: {body.get('error')}", False, None
+    return True, "", False, None
+
+
+def deliver_due(resolve, post=post_slack, outbox_file=OUTBOX_FILE, max_workers=MAX_CONCURRENCY):
+    """
+    Send every message that is due, up to max_workers at a time.
+    resolve(channel) -> post target (None if not configured).
+    Returns: number of messages delivered.
+    """
+    leased = _lease_due(outbox_file, _now())
+    if not leased:
+        return 0
+
+    def send(m):
+        target = resolve(m["channel"])
+        if not target:
+            return (m["key"], False, f"Channel '{m['channel']}' is not configured", True, None)
+        return (m["key"],) + post(target, m["text"])
+
+    if len(leased) == 1:
+        results = [send(leased[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(leased))) as pool:
+            results = list(pool.map(send, leased))
+    _record(outbox_file, results)
+    return sum(1 for r in results if r[1])
+
+
+def flush(resolve, timeout=120, post=post_slack, outbox_file=OUTBOX_FILE):
+    """
+    Deliver until nothing is pending (or timeout seconds passed), sleeping until the
+    next retry is due. For one-shot processes like auto_allocate.py.
+    Returns: number of messages still undelivered.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        deliver_due(resolve, post, outbox_file)
+        waiting = [m for m in messages(outbox_file) if m["status"] in ("pending", "sending")]
+        if not waiting or time.monotonic() >= deadline:
+            return len(waiting)
+        next_due = min(datetime.fromisoformat(m["next_attempt_at"]) for m in waiting)
+        pause = max(0.2, (next_due - _now()).total_seconds())
+        time.sleep(min(pause, max(0.0, deadline - time.monotonic())))
+
+
+class OutboxWorker(threading.Thread):
+    """Delivers queued messages in the background; woken early by enqueue()."""
+
+    def __init__(self, resolve, poll_seconds=POLL_SECONDS, outbox_file=OUTBOX_FILE):
+        super().__init__(name="slack-outbox", daemon=True)
+        self.resolve = resolve
+        self.poll_seconds = poll_seconds
+        self.outbox_file = outbox_file
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            _wake.clear()
+            try:
+                deliver_due(self.resolve, outbox_file=self.outbox_file)
+            except Exception as e:
+                print(f"⚠️ Slack outbox: {e}")
+            _wake.wait(self.poll_seconds)
+
+    def stop(self):
+        self._stop_event.set()
+        _wake.set()
+
+
+# --- Local webhook stub ---
+def run_stub(port, fail=0, code=500):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {"count": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps connections open, so pooled clients show up as reused ports
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status, body, headers=()):
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                state["count"] += 1
+                count = state["count"]
+            client = f"{self.client_address[0]}:{self.client_address[1]}"
+            if count <= fail:
+                self._reply(code, b"stub failure", [("Retry-After", "1")] if code == 429 else [])
+                print(f"❌ #{count} {client} -> {code}")
+                return
+            # Paths under /api/ answer like the Web API (chat.postMessage), others like a webhook
+            self._reply(200, b'{"ok": true}' if self.path.startswith("/api/") else b"ok")
+            payload = json.loads(body)
+            print(f"✅ #{count} {client} {self.path} {payload.get('channel', '')}: {payload.get('text', '')[:60]!r}")
+
+        def log_message(self, *args):
+            pass
+
+    print(f"🧪 Webhook stub on http://127.0.0.1:{port}/ (failing the first {fail} with {code})")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Slack outbox")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    flush_parser = sub.add_parser("flush")
+    flush_parser.add_argument("--timeout", type=float, default=120)
+    stub_parser = sub.add_parser("stub")
+    stub_parser.add_argument("--port", type=int, default=8765)
+    stub_parser.add_argument("--fail", type=int, default=0, help="answer the first N posts with an error")
+    stub_parser.add_argument("--code", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for m in messages():
+            print(f"{m['created_at']}  {m['status']:<8} x{m['attempts']}  {m['key']}  {m['last_error']}")
+    elif args.command == "flush":
+        left = flush(lambda channel: os.environ.get("SLACK_WEBHOOK_URL"), timeout=args.timeout)
+        print("✅ Outbox flushed" if not left else f"⚠️ {left} message(s) still undelivered")
+    else:
+        run_stub(args.port, args.fail, args.code)
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite Storage Backend
+Drop-in replacement for the JSON files behind storage.load_json/save_json.
+users.json, history.json, the monthly history partitions (history/YYYY-MM.json)
+and requests.json map to indexed tables; any other path (manifest, backups etc.)
+is stored as a whole document.
+
+Runs in WAL mode so readers never block the writer.
+Saves only touch rows whose content changed.
+
+One-shot import of the existing JSON files:
+    python sqlite_store.py import [parking.db]
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+USERS_DOC = "users.json"
+HISTORY_DOC = "history.json"
+REQUESTS_DOC = "requests.json"
+HISTORY_MONTH_RE = re.compile(r"(?:^|[\\/])history[\\/](\d{4}-\d{2})\.json$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    car_type TEXT,
+    last_parked_date TEXT,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS allocations (
+    date TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS request_days (
+    target_date TEXT PRIMARY KEY,
+    sante_opt_out INTEGER NOT NULL DEFAULT 0,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS applications (
+    target_date TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT,
+    body TEXT NOT NULL,
+    PRIMARY KEY (target_date, kind, seq)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    key TEXT PRIMARY KEY,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_position ON users (position);
+CREATE INDEX IF NOT EXISTS idx_allocations_position ON allocations (position);
+CREATE INDEX IF NOT EXISTS idx_applications_name ON applications (target_date, name);
+"""
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, sort_keys=True)
+
+
+class SqliteBackend:
+    name = "sqlite"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # One connection per thread (Streamlit serves sessions from a thread pool)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- load_json / save_json interface ---
+    def load(self, file_path, default_data):
+        doc = os.path.basename(file_path)
+        conn = self._connect()
+        if doc == USERS_DOC:
+            rows = conn.execute("SELECT body FROM users ORDER BY position").fetchall()
+            if not rows and not self._has_meta(conn, USERS_DOC):
+                return default_data
+            return [json.loads(r[0]) for r in rows]
+        if doc == HISTORY_DOC:
+            rows = conn.execute("SELECT body FROM allocations ORDER BY position").fetchall()
+            if not rows and not self._has_meta(conn, HISTORY_DOC):
+                return default_data
+            return [json.loads(r[0]) for r in rows]
+        month = HISTORY_MONTH_RE.search(file_path)
+        if month:
+            rows = conn.execute(
+                "SELECT body FROM allocations WHERE date BETWEEN ? AND ? ORDER BY date",
+                (f"{month.group(1)}-01", f"{month.group(1)}-31")
+            ).fetchall()
+            return [json.loads(r[0]) for r in rows] if rows else default_data
+        if doc == REQUESTS_DOC:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (REQUESTS_DOC,)).fetchone()
+            if row is None:
+                return default_data
+            return self.load_requests_for(row[0])
+
+        row = conn.execute("SELECT body FROM documents WHERE key = ?", (file_path,)).fetchone()
+        return json.loads(row[0]) if row else default_data
+
+    def save(self, file_path, data, backup=False):
+        # backup is a JSON-file concept; WAL + transactions cover crash safety here
+        doc = os.path.basename(file_path)
+        conn = self._connect()
+        with conn:
+            if doc == USERS_DOC:
+                self._save_rows(conn, "users", "name", [
+                    (u["name"], i, u.get("car_type"), u.get("last_parked_date"), _dumps(u))
+                    for i, u in enumerate(data)
+                ], ("name", "position", "car_type", "last_parked_date", "body"))
+                self._mark_saved(conn, USERS_DOC)
+            elif doc == HISTORY_DOC:
+                self._save_rows(conn, "allocations", "date", [
+                    (h["date"], i, _dumps(h)) for i, h in enumerate(data)
+                ], ("date", "position", "body"))
+                self._mark_saved(conn, HISTORY_DOC)
+            elif HISTORY_MONTH_RE.search(file_path):
+                month = HISTORY_MONTH_RE.search(file_path).group(1)
+                conn.execute(
+                    "DELETE FROM allocations WHERE date BETWEEN ? AND ?", (f"{month}-01", f"{month}-31")
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO allocations (date, position, body) VALUES (?, ?, ?)",
+                    [(h["date"], i, _dumps(h)) for i, h in enumerate(data)]
+                )
+            elif doc == REQUESTS_DOC:
+                self._save_requests(conn, data)
+            else:
+                conn.execute(
+                    "INSERT INTO documents (key, body) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET body = excluded.body",
+                    (file_path, _dumps(data))
+                )
+
+    # --- Indexed queries (no full-document load) ---
+    def history_for_date(self, date_str):
+        row = self._connect().execute(
+            "SELECT body FROM allocations WHERE date = ?", (date_str,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def history_range(self, start, end):
+        rows = self._connect().execute(
+            "SELECT body FROM allocations WHERE date BETWEEN ? AND ? ORDER BY date", (start, end)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def load_requests_for(self, target_date):
+        conn = self._connect()
+        day = conn.execute(
+            "SELECT sante_opt_out, extra FROM request_days WHERE target_date = ?", (target_date,)
+        ).fetchone()
+        data = json.loads(day[1]) if day else {}
+        data["target_date"] = target_date
+        data["sante_opt_out"] = bool(day[0]) if day else False
+        data["applicants"] = []
+        data["guests"] = []
+        rows = conn.execute(
+            "SELECT kind, body FROM applications WHERE target_date = ? ORDER BY kind, seq", (target_date,)
+        ).fetchall()
+        for kind, body in rows:
+            data["applicants" if kind == "staff" else "guests"].append(json.loads(body))
+        return data
+
+    # --- Internals ---
+    def _has_meta(self, conn, key):
+        return conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone() is not None
+
+    def _mark_saved(self, conn, doc):
+        # Distinguishes "saved as empty list" from "never saved" (-> default_data)
+        conn.execute("INSERT INTO meta (key, value) VALUES (?, '1') ON CONFLICT (key) DO NOTHING", (doc,))
+
+    def _save_rows(self, conn, table, key_col, rows, columns):
+        # Upsert only changed rows, then drop rows no longer present
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != key_col)
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({key_col}) DO UPDATE SET {updates} "
+            f"WHERE {table}.body != excluded.body OR {table}.position != excluded.position",
+            rows
+        )
+        keys = [r[0] for r in rows]
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS _keep (k TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM _keep")
+        conn.executemany("INSERT OR IGNORE INTO _keep (k) VALUES (?)", [(k,) for k in keys])
+        conn.execute(f"DELETE FROM {table} WHERE {key_col} NOT IN (SELECT k FROM _keep)")
+
+    def _save_requests(self, conn, data):
+        target_date = data["target_date"]
+        extra = {k: v for k, v in data.items()
+                 if k not in ("target_date", "sante_opt_out", "applicants", "guests")}
+        conn.execute(
+            "INSERT INTO request_days (target_date, sante_opt_out, extra) VALUES (?, ?, ?) "
+            "ON CONFLICT (target_date) DO UPDATE SET sante_opt_out = excluded.sante_opt_out, extra = excluded.extra",
+            (target_date, int(bool(data.get("sante_opt_out"))), _dumps(extra))
+        )
+        conn.execute("DELETE FROM applications WHERE target_date = ?", (target_date,))
+        rows = []
+        for seq, app in enumerate(data.get("applicants", [])):
+            name = app["name"] if isinstance(app, dict) else app
+            rows.append((target_date, "staff", seq, name, _dumps(app)))
+        for seq, g in enumerate(data.get("guests", [])):
+            rows.append((target_date, "guest", seq, g.get("name"), _dumps(g)))
+        conn.executemany(
+            "INSERT INTO applications (target_date, kind, seq, name, body) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (REQUESTS_DOC, target_date)
+        )
+
+
+def import_json(db_path, users_path=USERS_DOC, history_path=HISTORY_DOC, requests_path=REQUESTS_DOC):
+    """One-shot import of the existing JSON files into a SQLite database."""
+    from storage import _load_json_file
+
+    backend = SqliteBackend(db_path)
+    counts = {}
+    for path, default in ((users_path, []), (history_path, []), (requests_path, None)):
+        data = _load_json_file(path, default)
+        if data is None:
+            continue
+        backend.save(path, data)
+        counts[path] = len(data) if isinstance(data, list) else len(data.get("applicants", []))
+    return counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "import":
+        print("Usage: python sqlite_store.py import [parking.db]")
+        sys.exit(1)
+    db = sys.argv[2] if len(sys.argv) > 2 else "parking.db"
+    for path, count in import_json(db).items():
+        print(f"✅ {path}: {count} rows imported into {db}")
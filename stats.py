@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Per-user Statistics
+Running counters per staff member, maintained as history entries are saved,
+edited or deleted (a HistoryView subscribed to PartitionedHistory), so the admin
+UI and exports never rescan the archive:
+
+    {"parks", "waits", "zones": {zone_id: parks}, "months": {"YYYY-MM": {"parks", "waits"}},
+     "recent": [[date, zone_id | "wait"], ...]}   (last RECENT_DAYS days applied)
+
+Each change costs O(people in that entry). Counters are exact; "recent" is a
+bounded window, so deleting a day inside it leaves it one day short until the
+next rebuild.
+
+Rebuild from the archive:
+    python stats.py rebuild
+"""
+
+import sys
+from bisect import insort
+
+from history_store import HistoryView, PartitionedHistory, month_of
+from records import slot_keys
+from storage import load_json, save_json
+
+STATS_FILE = "stats.json"
+RECENT_DAYS = 20
+
+
+class UserStats(HistoryView):
+    PARAMS = {"recent_days": RECENT_DAYS}
+
+    def __init__(self, file_path=STATS_FILE, history=None):
+        super().__init__(file_path, history)
+
+    @staticmethod
+    def summarize(entry):
+        # [(name, zone_id or "wait")] for staff; guests are not tracked
+        outcomes = []
+        for key in slot_keys(entry):
+            outcomes.extend((r["name"], key) for r in entry[key] if r.get("kind") == "staff")
+        return {"date": entry["date"], "outcomes": outcomes}
+
+    @staticmethod
+    def apply(data, op):
+        people = data["people"]
+        if op[0] == "rename":
+            _, old, new = op
+            if old in people:
+                people[new] = people.pop(old)
+            return
+
+        _, summary, sign = op
+        date_str = summary["date"]
+        month = month_of(date_str)
+        for name, key in summary["outcomes"]:
+            p = people.setdefault(name, {"parks": 0, "waits": 0, "zones": {}, "months": {}, "recent": []})
+            counts = p["months"].setdefault(month, {"parks": 0, "waits": 0})
+            if key == "wait":
+                p["waits"] += sign
+                counts["waits"] += sign
+            else:
+                p["parks"] += sign
+                counts["parks"] += sign
+                p["zones"][key] = p["zones"].get(key, 0) + sign
+                if not p["zones"][key]:
+                    del p["zones"][key]
+            if not counts["parks"] and not counts["waits"]:
+                del p["months"][month]
+
+            recent = p["recent"]
+            if sign > 0:
+                insort(recent, [date_str, key])
+                del recent[:-RECENT_DAYS]
+            elif [date_str, key] in recent:
+                recent.remove([date_str, key])
+
+            if p["parks"] <= 0 and p["waits"] <= 0:
+                del people[name]
+
+    # --- Read ---
+    def last_parked(self, name):
+        p = self.get(name)
+        if not p:
+            return None
+        return next((d for d, key in reversed(p["recent"]) if key != "wait"), None)
+
+    def last_parked_date(self, user):
+        # Stored value, or a later (manual) entry from the statistics: what the staff tab and Excel show
+        dates = [d for d in (user.get("last_parked_date"), self.last_parked(user["name"])) if d]
+        return max(dates) if dates else None
+
+    def month(self, name, month):
+        p = self.get(name)
+        return p["months"].get(month, {"parks": 0, "waits": 0}) if p else {"parks": 0, "waits": 0}
+
+    def streak(self, name):
+        # Consecutive parks over the latest days applied (capped at RECENT_DAYS)
+        p = self.get(name)
+        count = 0
+        for _, key in reversed(p["recent"] if p else []):
+            if key == "wait":
+                break
+            count += 1
+        return count
+
+    def recent_dates(self, name, n=RECENT_DAYS):
+        # Latest parked dates, newest first
+        p = self.get(name)
+        if not p:
+            return []
+        return [d for d, key in reversed(p["recent"]) if key != "wait"][:n]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python stats.py rebuild")
+        sys.exit(1)
+    users = load_json("users.json", [])
+    archive = PartitionedHistory(user_index={u["name"]: u for u in users})
+    data = UserStats.build(archive.entries)
+    save_json(STATS_FILE, data)
+    print(f"✅ Statistics rebuilt for {len(data['people'])} people from {len(archive)} days")
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+JSON Storage Helpers
+Shared by app.py and auto_allocate.py.
+Writes go to a temp file in the same directory, are fsync'd, then atomically
+renamed over the target, so readers never see a half-written file.
+Read-modify-write cycles (update_json) take an advisory lock per file.
+
+Parsed JSON files are cached process-wide (Streamlit imports this module once per
+server process, so every session shares it), keyed on inode + mtime + size.
+
+The backend is pluggable: "json" (files, default) or "sqlite" (see sqlite_store.py).
+Select it with the PARKING_STORAGE / PARKING_DB environment variables or configure().
+"""
+
+import json
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, fall back to plain writes
+    fcntl = None
+
+LOCK_RETRIES = 50
+LOCK_BACKOFF = 0.01  # seconds, doubled per retry up to LOCK_BACKOFF_MAX
+LOCK_BACKOFF_MAX = 0.2
+
+# Storage backend selection
+STORAGE_BACKEND = os.environ.get("PARKING_STORAGE", "json")
+SQLITE_PATH = os.environ.get("PARKING_DB", "parking.db")
+
+_backend = None
+
+# abspath -> ((inode, mtime_ns, size), pickled data)
+_json_cache = {}
+_MISSING = object()
+
+
+def _fsync_dir(directory):
+    # Persist the rename itself (POSIX only)
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _read_json(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _load_json_file(file_path, default_data):
+    if not os.path.exists(file_path):
+        return default_data
+    try:
+        return _read_json(file_path)
+    except json.JSONDecodeError:
+        # Corrupted file: fall back to the last good copy instead of the empty default
+        backup_path = file_path + ".bak"
+        if os.path.exists(backup_path):
+            try:
+                print(f"⚠️ {file_path} is corrupted, loading {backup_path}")
+                return _read_json(backup_path)
+            except json.JSONDecodeError:
+                pass
+        return default_data
+
+
+def _stat_key(st):
+    # New inode per save (temp file + rename), so this changes on every write
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _save_json_file(file_path, data, backup=False):
+    """
+    Atomically write data as JSON.
+    backup=True keeps the previous version as <file>.bak (rolling, one copy).
+    Returns the stat key of the written file (preserved by the rename).
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(file_path)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+            stat_key = _stat_key(os.fstat(f.fileno()))
+
+        if backup and os.path.exists(file_path):
+            backup_path = file_path + ".bak"
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
+            try:
+                # Hard link is instant and keeps the target in place for readers
+                os.link(file_path, backup_path)
+            except OSError:
+                shutil.copy2(file_path, backup_path)
+
+        os.replace(tmp_path, file_path)
+        _fsync_dir(directory)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return stat_key
+
+
+class JsonBackend:
+    """One JSON document per file (default)."""
+    name = "json"
+
+    def load(self, file_path, default_data):
+        key = os.path.abspath(file_path)
+        try:
+            stat_key = _stat_key(os.stat(file_path))
+        except FileNotFoundError:
+            _json_cache.pop(key, None)
+            return default_data
+
+        cached = _json_cache.get(key)
+        if cached and cached[0] == stat_key:
+            # Callers mutate what they load; unpickling hands out a private copy
+            return pickle.loads(cached[1])
+
+        data = _load_json_file(file_path, _MISSING)
+        if data is _MISSING:
+            return default_data
+        _json_cache[key] = (stat_key, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+        return data
+
+    def save(self, file_path, data, backup=False):
+        stat_key = _save_json_file(file_path, data, backup=backup)
+        # Write-through: the next load is served from memory
+        _json_cache[os.path.abspath(file_path)] = (stat_key, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+
+def configure(backend=None, db_path=None):
+    """
+    Select the storage backend for this process: "json" or "sqlite".
+    Call before the first load_json/save_json.
+    """
+    global STORAGE_BACKEND, SQLITE_PATH, _backend
+    backend = backend or STORAGE_BACKEND
+    db_path = db_path or SQLITE_PATH
+    # Called on every Streamlit rerun - keep the open backend unless the config changed
+    if (backend, db_path) != (STORAGE_BACKEND, SQLITE_PATH):
+        STORAGE_BACKEND, SQLITE_PATH = backend, db_path
+        _backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "sqlite":
+            from sqlite_store import SqliteBackend
+            _backend = SqliteBackend(SQLITE_PATH)
+        elif STORAGE_BACKEND == "json":
+            _backend = JsonBackend()
+        else:
+            raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+    return _backend
+
+
+def load_json(file_path, default_data):
+    return get_backend().load(file_path, default_data)
+
+
+def save_json(file_path, data, backup=False):
+    get_backend().save(file_path, data, backup=backup)
+
+
+@contextmanager
+def file_lock(file_path, shared=False):
+    """
+    Advisory lock on <file>.lock (the data file itself is replaced on save).
+    Exclusive by default; shared=True lets many holders in at once (e.g. appenders)
+    while still excluding an exclusive holder.
+    Retries with jittered backoff instead of blocking forever.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    fd = os.open(file_path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        delay = LOCK_BACKOFF
+        for attempt in range(LOCK_RETRIES):
+            try:
+                fcntl.flock(fd, mode | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if attempt == LOCK_RETRIES - 1:
+                    raise TimeoutError(f"Could not lock {file_path}")
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, LOCK_BACKOFF_MAX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def update_json(file_path, default_data, mutate, backup=False):
+    """
+    Locked read-modify-write.
+    mutate(data) edits the freshly loaded data in place. Return False to skip saving.
+    Returns: (data, mutate_result)
+    """
+    with file_lock(file_path):
+        data = load_json(file_path, default_data)
+        result = mutate(data)
+        if result is not False:
+            save_json(file_path, data, backup=backup)
+    return data, result
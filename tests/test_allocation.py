@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import copy
+
+import pytest
+
+from allocation import AllocationQueue, allocate, build_candidates, get_capacity, mark_parked
+from capacity import DEFAULT_CONFIG
+
+DATE = "2025-06-02"
+
+
+def staff(name, car_type="SEDAN", last_parked=None):
+    return {"name": name, "car_type": car_type, "last_parked_date": last_parked}
+
+
+def applicant(name, time):
+    return {"name": name, "timestamp": f"2025-06-02T{time}"}
+
+
+def guest(name, car_type="SEDAN", location="상관없음(ANY)", time="07:00:00"):
+    return {"name": name, "car_type": car_type, "location": location, "timestamp": f"2025-06-02T{time}"}
+
+
+def names(records):
+    return [r["name"] for r in records]
+
+
+@pytest.fixture
+def capacity():
+    return get_capacity(DEFAULT_CONFIG, DATE)
+
+
+def test_capacity_sante_opt_out_adds_tower_slot():
+    slots = {z["id"]: z["slots"] for z in get_capacity(DEFAULT_CONFIG, DATE)}
+    assert slots == {"tower": 2, "admin": 1}
+    slots = {z["id"]: z["slots"] for z in get_capacity(DEFAULT_CONFIG, DATE, True)}
+    assert slots == {"tower": 3, "admin": 1}
+
+
+def test_guests_are_placed_before_staff(capacity):
+    users = [staff("A"), staff("B"), staff("C")]
+    requests = {
+        "applicants": [applicant("A", "07:00:00"), applicant("B", "07:01:00"), applicant("C", "07:02:00")],
+        "guests": [guest("G", time="07:59:00")]
+    }
+    entry, parked = allocate(requests, users, capacity, DATE)
+    assert names(entry["tower"]) == ["G", "A"]
+    assert names(entry["admin"]) == ["B"]
+    assert names(entry["wait"]) == ["C"]
+    assert parked == ["A", "B"]
+
+
+def test_guest_location_limits_zone(capacity):
+    requests = {"applicants": [], "guests": [guest("G", location="관리실(ADMIN)")]}
+    entry, _ = allocate(requests, [], capacity, DATE)
+    assert names(entry["admin"]) == ["G"]
+    assert entry["tower"] == []
+
+
+def test_suv_only_parks_in_admin(capacity):
+    users = [staff("S1", "SUV"), staff("S2", "SUV")]
+    requests = {"applicants": [applicant("S1", "07:00:00"), applicant("S2", "07:01:00")]}
+    entry, parked = allocate(requests, users, capacity, DATE)
+    assert entry["tower"] == []
+    assert names(entry["admin"]) == ["S1"]
+    assert names(entry["wait"]) == ["S2"]
+    assert parked == ["S1"]
+
+
+def test_sedans_fill_tower_before_admin(capacity):
+    users = [staff("A"), staff("B"), staff("C"), staff("S", "SUV")]
+    requests = {"applicants": [applicant(n, f"07:0{i}:00") for i, n in enumerate("ABCS")]}
+    entry, _ = allocate(requests, users, capacity, DATE)
+    assert names(entry["tower"]) == ["A", "B"]
+    assert names(entry["admin"]) == ["C"]
+    assert names(entry["wait"]) == ["S"]
+
+
+def test_sante_opt_out_capacity_is_used():
+    capacity = get_capacity(DEFAULT_CONFIG, DATE, True)
+    users = [staff("A"), staff("B"), staff("C"), staff("D")]
+    requests = {"applicants": [applicant(n, f"07:0{i}:00") for i, n in enumerate("ABCD")]}
+    entry, parked = allocate(requests, users, capacity, DATE)
+    assert names(entry["tower"]) == ["A", "B", "C"]
+    assert names(entry["admin"]) == ["D"]
+    assert entry["wait"] == []
+    assert len(parked) == 4
+
+
+def test_waitlist_orders_by_last_parked_then_application_time(capacity):
+    users = [staff("Recent", last_parked="2025-05-30"), staff("Never"),
+             staff("Old", last_parked="2025-05-01"), staff("Late"),
+             staff("Mid", last_parked="2025-05-20")]
+    requests = {"applicants": [applicant("Recent", "07:00:00"), applicant("Old", "07:01:00"),
+                               applicant("Mid", "07:02:00"), applicant("Late", "07:04:00"),
+                               applicant("Never", "07:03:00")]}
+    entry, parked = allocate(requests, users, capacity, DATE)
+    assert names(entry["tower"]) == ["Never", "Late"]
+    assert names(entry["admin"]) == ["Old"]
+    assert names(entry["wait"]) == ["Mid", "Recent"]
+    assert parked == ["Never", "Late", "Old"]
+
+
+def test_optimal_solver_matches_greedy_priority(capacity):
+    users = [staff("A"), staff("S", "SUV")]
+    requests = {"applicants": [applicant("A", "07:00:00"), applicant("S", "07:01:00")]}
+    greedy, _ = allocate(requests, users, capacity, DATE)
+    optimal, _ = allocate(requests, users, capacity, DATE, solver="optimal")
+    assert names(greedy["tower"]) == names(optimal["tower"]) == ["A"]
+    assert names(greedy["admin"]) == names(optimal["admin"]) == ["S"]
+
+
+def test_optimal_solver_parks_more_when_a_sedan_holds_the_suv_slot():
+    # Fill order admin -> tower: greedy puts the first SEDAN in the only SUV-capable slot
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    site = config["sites"][0]
+    site["zones"] = [dict(site["zones"][1]), dict(site["zones"][0], slots=1)]
+    capacity = get_capacity(config, DATE)
+    users = [staff("A"), staff("S", "SUV"), staff("T", "SUV")]
+    requests = {"applicants": [applicant("A", "07:00:00"), applicant("S", "07:01:00"),
+                               applicant("T", "07:02:00")]}
+
+    greedy, greedy_parked = allocate(requests, users, capacity, DATE)
+    optimal, optimal_parked = allocate(requests, users, capacity, DATE, solver="optimal")
+
+    assert greedy_parked == ["A"]
+    assert names(greedy["wait"]) == ["S", "T"]
+    assert len(optimal_parked) > len(greedy_parked)
+    # Priority holds among the parked: S (earlier) parks, T (later) waits
+    assert optimal_parked == ["A", "S"]
+    assert names(optimal["tower"]) == ["A"]
+    assert names(optimal["admin"]) == ["S"]
+    assert names(optimal["wait"]) == ["T"]
+
+
+def test_build_candidates_skips_unknown_staff_and_sorts():
+    users = [staff("A", last_parked="2025-05-30"), staff("B")]
+    requests = {
+        "applicants": [applicant("A", "07:00:00"), applicant("Ghost", "07:00:30"), applicant("B", "07:01:00")],
+        "guests": [guest("G2", time="07:30:00"), guest("G1", "SUV", time="07:10:00")]
+    }
+    staff_c, guest_c = build_candidates(requests, users)
+    assert [c["name"] for c in staff_c] == ["B", "A"]
+    assert [c["name"] for c in guest_c] == ["G1", "G2"]
+    assert guest_c[0]["record"] == {"name": "G1", "car_type": "SUV", "kind": "guest",
+                                    "applied_at": "2025-06-02T07:10:00", "source": "auto"}
+
+    staff_c, _ = build_candidates(requests, users, sort=False)
+    assert [c["name"] for c in staff_c] == ["A", "B"]
+
+
+def test_build_candidates_accepts_legacy_name_strings():
+    staff_c, _ = build_candidates({"applicants": ["A"]}, [staff("A")])
+    assert staff_c[0]["record"]["applied_at"] is None
+
+
+def test_mark_parked_sets_last_parked_date():
+    users = [staff("A"), staff("B", last_parked="2025-05-01")]
+    mark_parked(users, ["A"], DATE)
+    assert users[0]["last_parked_date"] == DATE
+    assert users[1]["last_parked_date"] == "2025-05-01"
+
+
+def test_queue_late_insert_matches_full_rerun(capacity):
+    users = [staff("A", last_parked="2025-05-30"), staff("B", last_parked="2025-05-20"),
+             staff("C", last_parked="2025-05-10"), staff("S", "SUV", last_parked="2025-05-01"),
+             staff("Late")]
+    early = {"applicants": [applicant(n, f"07:0{i}:00") for i, n in enumerate("ABCS")]}
+    staff_c, _ = build_candidates(early, users, sort=False)
+    queue = AllocationQueue(capacity)
+    for c in staff_c:
+        queue.push(c)
+    entry, _ = queue.result(DATE)
+    assert names(entry["wait"]) == ["A"]
+
+    # "Late" never parked, so it outranks everyone already placed and bumps the tail
+    late = dict(early, applicants=early["applicants"] + [applicant("Late", "07:30:00")])
+    (late_c,), _ = build_candidates({"applicants": late["applicants"][-1:]}, users)
+    queue.push(late_c)
+    entry, parked = queue.result(DATE)
+
+    assert (entry, parked) == allocate(late, users, capacity, DATE)
+    assert names(entry["tower"]) == ["Late", "C"]
+    assert names(entry["admin"]) == ["S"]
+    assert names(entry["wait"]) == ["B", "A"]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import storage
+from capacity import DEFAULT_CONFIG, load_capacity_config, resolve_zones
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    backend, db_path = storage.STORAGE_BACKEND, storage.SQLITE_PATH
+    storage.configure("sqlite", str(tmp_path / "parking.db"))
+    yield
+    storage.configure(backend, db_path)
+
+
+def test_config_file_is_read_under_sqlite_storage(tmp_path, sqlite_storage):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    config["sites"][0]["zones"][0]["slots"] = 9
+    path = tmp_path / "capacity.json"
+    path.write_text(json.dumps(config), encoding="utf-8")
+
+    zones = resolve_zones(load_capacity_config(str(path)))
+    assert [z["slots"] for z in zones] == [9, 1]
+
+
+def test_missing_or_broken_config_falls_back_to_default(tmp_path):
+    assert load_capacity_config(str(tmp_path / "missing.json")) == DEFAULT_CONFIG
+    broken = tmp_path / "capacity.json"
+    broken.write_text("{", encoding="utf-8")
+    assert load_capacity_config(str(broken)) == DEFAULT_CONFIG
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from excel_export import build_workbook
+from history_store import PartitionedHistory
+from records import make_record
+from stats import UserStats
+
+
+def test_last_parked_column_matches_the_staff_tab(tmp_path):
+    directory = str(tmp_path / "history")
+    history = PartitionedHistory(directory=directory, legacy_file=os.path.join(directory, "none.json"))
+    # Manual entry newer than the stored last_parked_date
+    history.upsert({"date": "2025-06-05", "tower": [make_record("A", "SEDAN", source="manual")],
+                    "admin": [], "wait": []})
+    user_stats = UserStats(str(tmp_path / "stats.json"), history=history)
+    users = [{"name": "A", "car_type": "SEDAN", "last_parked_date": "2025-06-02"},
+             {"name": "B", "car_type": "SUV", "last_parked_date": None}]
+    zones = [{"id": "tower", "name": "타워"}, {"id": "admin", "name": "관리동"}]
+
+    data = build_workbook(users, user_stats, history, zones, "2025-06")
+    rows = list(openpyxl.load_workbook(io.BytesIO(data))["직원"].values)
+    assert rows[0][4] == "마지막 주차일"
+    # Later of users.json and the history, blank when never parked
+    assert [row[4] for row in rows[1:]] == ["2025-06-05", None]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import pytest
+
+from history_store import PartitionedHistory
+from records import make_record
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "history")
+
+
+def entry(date_str, *names):
+    return {"date": date_str, "tower": [make_record(n, "SEDAN") for n in names], "admin": [], "wait": []}
+
+
+def open_history(directory):
+    return PartitionedHistory(directory=directory, legacy_file=os.path.join(directory, "none.json"))
+
+
+def test_concurrent_saves_to_one_month_keep_both(directory):
+    first, second = open_history(directory), open_history(directory)
+    first.upsert(entry("2025-06-02", "A"))
+    second.upsert(entry("2025-06-03", "B"))
+    first.save()
+    second.save()
+
+    archive = open_history(directory)
+    assert [h["date"] for h in archive.month("2025-06")] == ["2025-06-02", "2025-06-03"]
+    assert len(archive) == 2
+    # The later writer also sees what the other one saved
+    assert "2025-06-02" in second
+
+
+def test_concurrent_remove_only_drops_its_own_date(directory):
+    seed = open_history(directory)
+    seed.upsert(entry("2025-06-02", "A"))
+    seed.upsert(entry("2025-06-03", "B"))
+    seed.save()
+
+    first, second = open_history(directory), open_history(directory)
+    first.get("2025-06-02")
+    second.get("2025-06-02")
+    first.remove("2025-06-02")
+    second.upsert(entry("2025-06-04", "C"))
+    first.save()
+    second.save()
+
+    archive = open_history(directory)
+    assert [h["date"] for h in archive.month("2025-06")] == ["2025-06-03", "2025-06-04"]
+    assert len(archive) == 2
+
+
+def test_touched_entry_is_written(directory):
+    seed = open_history(directory)
+    seed.upsert(entry("2025-06-02", "A"))
+    seed.save()
+
+    archive = open_history(directory)
+    assert archive.rename_staff("A", "Z", "SUV")
+    other = open_history(directory)
+    other.upsert(entry("2025-06-05", "B"))
+    other.save()
+    archive.save()
+
+    reloaded = open_history(directory)
+    assert reloaded.get("2025-06-02")["tower"][0]["name"] == "Z"
+    assert reloaded.get("2025-06-05") is not None
+
+
+def test_legacy_file_is_retired_after_migration(tmp_path):
+    directory = str(tmp_path / "history")
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps([entry("2025-06-02", "Old")]), encoding="utf-8")
+
+    archive = PartitionedHistory(directory=directory, legacy_file=str(legacy))
+    assert not legacy.exists()
+    assert (tmp_path / "history.json.migrated").exists()
+
+    archive.upsert(entry("2025-06-02", "New"))
+    archive.save()
+    archive.upsert(entry("2025-06-03", "B"))
+    archive.save()
+
+    # Losing or corrupting the manifest must not re-import the stale legacy entry
+    os.remove(os.path.join(directory, "manifest.json"))
+    reloaded = PartitionedHistory(directory=directory, legacy_file=str(legacy))
+    assert reloaded.get("2025-06-02")["tower"][0]["name"] == "New"
+
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        f.write("{")
+    reloaded = PartitionedHistory(directory=directory, legacy_file=str(legacy))
+    assert reloaded.get("2025-06-02")["tower"][0]["name"] == "New"
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from allocation import get_capacity
+from capacity import DEFAULT_CONFIG, get_site
+from notifications import render_notifications
+from records import make_record
+
+DATE = "2025-06-02"
+
+
+def test_direct_notice_for_a_zone_missing_from_the_config():
+    capacity = get_capacity(DEFAULT_CONFIG, DATE)
+    users = {"A": {"name": "A", "car_type": "SEDAN", "slack_id": "U1"},
+             "B": {"name": "B", "car_type": "SEDAN", "slack_id": "U2"}}
+    entry = {"date": DATE, "tower": [], "admin": [], "annex": [make_record("A", "SEDAN")],
+             "wait": [make_record("B", "SEDAN")]}
+
+    messages = render_notifications(entry, capacity, users, get_site(DEFAULT_CONFIG))
+    direct = {m["channel"]: m["text"] for m in messages if m["channel"].startswith("dm:")}
+
+    assert "**annex** 배정되었습니다" in direct["dm:U1"]
+    assert "None" not in direct["dm:U1"]
+    assert "대기 1번" in direct["dm:U2"]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import storage
+from history_store import PartitionedHistory
+from parquet_export import MANIFEST_FILE, export
+from records import make_record
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    backend, db_path = storage.STORAGE_BACKEND, storage.SQLITE_PATH
+    storage.configure("sqlite", str(tmp_path / "parking.db"))
+    yield
+    storage.configure(backend, db_path)
+
+
+def test_manifest_is_a_file_next_to_the_data_under_sqlite(tmp_path, sqlite_storage):
+    directory = str(tmp_path / "history")
+    history = PartitionedHistory(directory=directory, legacy_file=os.path.join(directory, "none.json"))
+    history.upsert({"date": "2025-06-02", "tower": [make_record("A", "SEDAN")], "admin": [], "wait": []})
+    history.save()
+    export_dir = tmp_path / "export"
+
+    assert export(history, {}, str(export_dir)) == ["2025-06"]
+    manifest = json.loads((export_dir / MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert list(manifest["months"]) == ["2025-06"]
+    # No temp files left behind, and an unchanged archive is not rewritten
+    assert not [name for _, _, files in os.walk(export_dir) for name in files if name.endswith(".tmp")]
+    assert export(history, {}, str(export_dir)) == []
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+import request_log
+from request_log import append_event, compact, load_requests, read_events, reset_requests
+
+DATE = "2025-06-02"
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "requests.json"), str(tmp_path / "requests_log.jsonl")
+
+
+def apply(log_path, name, date=DATE):
+    append_event(log_path, {"op": "apply", "target_date": date, "name": name,
+                            "timestamp": f"{date}T07:00:00"})
+
+
+def test_appended_events_are_read_incrementally(paths):
+    snapshot_path, log_path = paths
+    apply(log_path, "A")
+    assert [e["name"] for e in read_events(log_path)] == ["A"]
+    apply(log_path, "B")
+    assert [e["name"] for e in read_events(log_path)] == ["A", "B"]
+
+
+def test_stale_cache_from_before_compaction_is_dropped(paths):
+    snapshot_path, log_path = paths
+    apply(log_path, "A")
+    apply(log_path, "B")
+    read_events(log_path)
+    # Another process's cache from before the compaction (same path, maybe the same inode)
+    stale = request_log._events_cache[os.path.abspath(log_path)]
+
+    compact(snapshot_path, log_path, DATE)
+    request_log._events_cache[os.path.abspath(log_path)] = stale
+    for name in ("C", "D", "E"):
+        apply(log_path, name)
+
+    assert [e["name"] for e in read_events(log_path)] == ["C", "D", "E"]
+    data = load_requests(snapshot_path, log_path, DATE)
+    assert [a["name"] for a in data["applicants"]] == ["A", "B", "C", "D", "E"]
+
+
+def test_compact_rereads_the_whole_log(paths):
+    snapshot_path, log_path = paths
+    apply(log_path, "A")
+    read_events(log_path)
+    request_log._events_cache[os.path.abspath(log_path)] = (None, 0, [])
+    data = compact(snapshot_path, log_path, DATE)
+    assert [a["name"] for a in data["applicants"]] == ["A"]
+
+
+def test_reset_starts_an_empty_log(paths):
+    snapshot_path, log_path = paths
+    apply(log_path, "A")
+    read_events(log_path)
+    reset_requests(snapshot_path, log_path, DATE)
+    assert read_events(log_path) == []
+    apply(log_path, "B")
+    assert [a["name"] for a in load_requests(snapshot_path, log_path, DATE)["applicants"]] == ["B"]
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import scheduler
+from request_log import REQUESTS_LOG_FILE, append_event
+from run_ledger import get_run
+from storage import save_json
+
+DATE = "2025-06-02"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_json("users.json", [{"name": "A", "car_type": "SEDAN", "last_parked_date": None}])
+    append_event(REQUESTS_LOG_FILE, {"op": "apply", "target_date": DATE, "name": "A",
+                                     "timestamp": f"{DATE}T07:00:00"})
+    return tmp_path
+
+
+def test_failed_notification_is_retried_by_the_next_run(workdir):
+    calls = []
+
+    def broken(entry, capacity, user_index, site):
+        raise RuntimeError("outbox unavailable")
+
+    def notify(entry, capacity, user_index, site):
+        calls.append(entry["date"])
+        return True, "queued"
+
+    with pytest.raises(RuntimeError):
+        scheduler.run_allocation(DATE, notify=broken, log=lambda msg: None)
+    run = get_run("plabhouse", DATE)
+    assert (run["status"], run["notify"]) == ("done", "pending")
+
+    status, entry, _ = scheduler.run_allocation(DATE, notify=notify, log=lambda msg: None)
+    assert status == "notified"
+    assert [r["name"] for r in entry["tower"]] == ["A"]
+    assert get_run("plabhouse", DATE)["notify"] == "queued"
+
+    # Notified once: later calls are no-ops
+    status, _, _ = scheduler.run_allocation(DATE, notify=notify, log=lambda msg: None)
+    assert status == "exists"
+    assert calls == [DATE]
+
+
+def test_run_without_notify_records_no_notification(workdir):
+    status, _, _ = scheduler.run_allocation(DATE, log=lambda msg: None)
+    assert status == "allocated"
+    assert get_run("plabhouse", DATE)["notify"] is None
+
+
+def _run_in_new_process(workdir):
+    # A separate interpreter, like the next GitHub Actions run: only the files carry over
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f"import scheduler; print(scheduler.run_allocation({DATE!r}, log=lambda msg: None)[0])"
+    out = subprocess.run([sys.executable, "-c", code], cwd=workdir, capture_output=True, text=True,
+                         env={**os.environ, "PYTHONPATH": repo, "PARKING_STORAGE": "json"}, check=True)
+    return out.stdout.strip().splitlines()[-1]
+
+
+def test_ledger_alone_stops_a_rerun_in_another_process(workdir):
+    assert _run_in_new_process(workdir) == "allocated"
+    # The workflow restores runs.json but starts from a fresh checkout without the new history
+    shutil.rmtree(workdir / "history")
+    assert _run_in_new_process(workdir) == "exists"
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import slack_outbox
+from notifier import NotifierClient
+
+
+@pytest.fixture
+def outbox_file(tmp_path):
+    return str(tmp_path / "slack_outbox.json")
+
+
+def make_due(outbox_file):
+    def mutate(outbox):
+        for m in outbox:
+            m["next_attempt_at"] = "2000-01-01T00:00:00"
+    slack_outbox.update_json(outbox_file, [], mutate)
+
+
+def test_local_rate_limit_skip_does_not_count_attempts(outbox_file):
+    slack_outbox.enqueue("hi", key="k", outbox_file=outbox_file)
+    skipped = lambda target, text: (False, slack_outbox.RATE_LIMITED, True, 30)
+
+    for _ in range(slack_outbox.MAX_ATTEMPTS + 2):
+        make_due(outbox_file)
+        slack_outbox.deliver_due(lambda channel: "http://hook", post=skipped, outbox_file=outbox_file)
+
+    (m,) = slack_outbox.messages(outbox_file)
+    assert m["status"] == "pending"
+    assert m["attempts"] == 0
+    assert m["next_attempt_at"] > slack_outbox._iso(slack_outbox._now())
+
+
+def test_failed_posts_count_attempts(outbox_file):
+    slack_outbox.enqueue("hi", key="k", outbox_file=outbox_file)
+    slack_outbox.deliver_due(lambda channel: "http://hook", outbox_file=outbox_file,
+                             post=lambda target, text: (False, "HTTP 503", True, None))
+    (m,) = slack_outbox.messages(outbox_file)
+    assert (m["status"], m["attempts"]) == ("pending", 1)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, body='{"ok": true}'):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = body
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def test_429_holds_back_only_that_target(monkeypatch):
+    client = NotifierClient()
+    posted = []
+
+    def post(url, **kwargs):
+        channel = kwargs["json"]["channel"]
+        posted.append(channel)
+        if channel == "U1":
+            return FakeResponse(429, {"Retry-After": "30"}, "ratelimited")
+        return FakeResponse(200)
+    monkeypatch.setattr(client.session, "post", post)
+    monkeypatch.setattr(slack_outbox, "get_client", lambda: client)
+
+    def dm(member):
+        return {"url": "https://slack.com/api/chat.postMessage", "token": "t", "channel": member}
+
+    ok, error, retriable, retry_after = slack_outbox.post_slack(dm("U1"), "hi")
+    assert (ok, retriable) == (False, True)
+    assert error.startswith("HTTP 429")
+    assert 29 < retry_after <= 30
+
+    # U1 waits out Retry-After without a request; U2 is not affected
+    assert slack_outbox.post_slack(dm("U1"), "again")[1] == slack_outbox.RATE_LIMITED
+    assert slack_outbox.post_slack(dm("U2"), "hi") == (True, "", False, None)
+    assert posted == ["U1", "U2"]